@@ -52,3 +52,7 @@ class WritingBenchDataset(MathDataset):
     def extract_solution(self, task_id: str, response: str | None) -> str:
         r"""Extract the answer from the response."""
         return response or ""
+
+    def stop_reason(self, response: str) -> str | None:
+        r"""Answers are not boxed, never stop early."""
+        return None
@@ -1,18 +1,21 @@
+import asyncio
 import hashlib
 import json
 import os
 import pickle
 from abc import ABC, abstractmethod
+from collections import Counter
 from dataclasses import dataclass
 from functools import wraps
 from os import PathLike
 from pathlib import Path
 from typing import Any, ClassVar
 
-import aiofiles
 import orjson
 
+from evalhub.inference.raw import index_path, iter_raw, raw_path, slim_response, zstd_compressor
 from evalhub.inference.schemas import GenerationConfig
+from evalhub.inference.writer import BatchWriter, drop_torn_line
 from evalhub.utils.logger import logger
 
 
@@ -40,6 +43,12 @@ class GroundTruth:
     answer: str
 
 
+def record_task_id(line: bytes) -> str:
+    r"""Task id of a raw record, parsing only the ``task_id`` prefix and not the response."""
+    end = line.find(b',"response":')
+    return orjson.loads(line[:end] + b"}" if end > 0 else line)["task_id"]
+
+
 def preprocess_response(func):
     r"""Preprocess the response."""
 
@@ -73,6 +82,8 @@ class Dataset(ABC):
         self.groundtruth: dict[str, GroundTruth] = {}
         self.config = config
         self.meta_data: dict[str, Any] = meta_data or {}
+        # Pool extracting solutions off the event loop, set by the generator, None extracts inline
+        self.extractor = None
         if override_args is not None:
             args = json.loads(override_args)
             for key, value in args.items():
@@ -89,6 +100,13 @@ class Dataset(ABC):
             self.load_tasks()
             self.save_cache()
 
+    def __getstate__(self) -> dict[str, Any]:
+        # Open files and pending writes stay in the generating process, e.g. when sent to the extraction pool
+        state = self.__dict__.copy()
+        for key in ("writer", "sanitized_writes", "extractor"):
+            state.pop(key, None)
+        return state
+
     def __init_subclass__(cls, **kwargs):
         super().__init_subclass__(**kwargs)
         # auto decorate the extract_solution method
@@ -127,13 +145,77 @@ class Dataset(ABC):
 
     async def init_files(self):
         r"""Initialize the files for the dataset."""
-        self.raw_file = await aiofiles.open(self.config.output_dir / f"{self.name}_raw.jsonl", "ab")
-        self.sanitized_file = await aiofiles.open(self.config.output_dir / f"{self.name}.jsonl", "ab")
+        self.raw_path = raw_path(self.config.output_dir, self.name, self.config.raw_format)
+        self.index_path = index_path(self.raw_path)
+        self.sanitized_path = self.config.output_dir / f"{self.name}.jsonl"
+        drop_torn_line(self.sanitized_path)
+        self.load_index()
+        self.writer = BatchWriter(
+            [self.raw_path, self.sanitized_path],
+            self.config.fsync_interval,
+            indexes={self.raw_path: self.index_path},
+            encoders={self.raw_path: zstd_compressor()} if self.config.raw_format == "zstd" else None,
+        )
+        self.sanitized_writes: dict[str, asyncio.Task[list[str]]] = {}
 
     async def close_files(self):
-        r"""Close the files for the dataset."""
-        await self.raw_file.close()
-        await self.sanitized_file.close()
+        r"""Close the files for the dataset, once the pending solutions are written."""
+        await asyncio.gather(*self.sanitized_writes.values())
+        self.sanitized_writes.clear()
+        await self.writer.close()
+
+    def load_index(self) -> None:
+        r"""Count the saved samples per task from the sidecar index of the raw file.
+
+        The index holds one ``[task_id, offset, length]`` line per raw record, locating the line or
+        the zstd frame holding it, so resuming reads neither the responses nor the raw file. If the
+        index is missing or does not end where the raw file ends, e.g. after a crash in the middle of
+        a batch, it is rebuilt with a count-only scan, which drops a torn record at the end.
+        """
+        self.num_saved: Counter[str] = Counter()
+        size = self.raw_path.stat().st_size if self.raw_path.exists() else 0
+        if size == 0:
+            self.index_path.unlink(missing_ok=True)
+            return
+        end = 0
+        try:
+            with open(self.index_path, "rb") as f:
+                for line in f:
+                    task_id, offset, length = orjson.loads(line)
+                    self.num_saved[task_id] += 1
+                    end = offset + length
+        except (OSError, ValueError):
+            end = -1
+        if end != size:
+            self._rebuild_index(size)
+
+    def _rebuild_index(self, size: int) -> None:
+        logger.info(f"Rebuilding the index of {self.raw_path}")
+        self.num_saved = Counter()
+        end = 0
+        with open(self.index_path, "wb") as index:
+            for offset, length, line in iter_raw(self.raw_path):
+                task_id = record_task_id(line)
+                index.write(orjson.dumps([task_id, offset, length]) + b"\n")
+                self.num_saved[task_id] += 1
+                end = offset + length
+        if end < size:
+            logger.warning(f"Dropping a torn record at the end of {self.raw_path}")
+            os.truncate(self.raw_path, end)
+
+    async def import_samples(self, path: Path, n_samples: int) -> int:
+        r"""Save the raw samples of a previous run, up to ``n_samples`` per task, returning how many.
+
+        Solutions are extracted again and samples of tasks not in the dataset are skipped.
+        """
+        num_imported = 0
+        for _, _, line in iter_raw(path):
+            record = orjson.loads(line)
+            task_id = record["task_id"]
+            if task_id in self.tasks and self.num_saved[task_id] < n_samples:
+                await self.save_single_task(task_id, [record["response"]])
+                num_imported += 1
+        return num_imported
 
     @abstractmethod
     def load_tasks(self):
@@ -168,16 +250,55 @@ class Dataset(ABC):
         r"""Extract solution from the response."""
         return response or ""
 
-    async def save_single_task(self, task_id: str, responses: list[dict]) -> None:
-        r"""Save results for a single task (append mode)."""
+    def stop_reason(self, response: str) -> str | None:
+        r"""Return why generation can stop early given the response so far, or None to continue.
+
+        Used by ``--early-stop`` to cancel streamed generations once the answer is final.
+        """
+        return None
+
+    async def save_single_task(self, task_id: str, responses: list[dict]) -> asyncio.Task[list[str]]:
+        r"""Save results for a single task (append mode).
+
+        Raw records are written at once, before waiting for room in the extraction queue. Solutions
+        are extracted in the ``extractor`` pool if set and written to the sanitized file as they
+        complete, in order within a task but not across tasks. Returns a task resolving to the
+        extracted solutions.
+        """
+        contents = []
         for response in responses:
-            await self.raw_file.write(orjson.dumps({"task_id": task_id, "response": response}) + b"\n")
+            saved = slim_response(response) if self.config.raw_format == "zstd" else response
+            await self.writer.write(
+                self.raw_path, orjson.dumps({"task_id": task_id, "response": saved}) + b"\n", task_id
+            )
+            self.num_saved[task_id] += 1
             if "content" in response:  # FIXME: multiturn
-                content = response.get("content", "")
+                contents.append(response.get("content", ""))
+            else:
+                contents.append(response.get("choices", [{}])[0].get("message", {}).get("content", ""))
+        solutions = []
+        for content in contents:
+            if self.extractor is not None:
+                solutions.append(await self.extractor.submit(self.name, task_id, content))
             else:
-                content = response.get("choices", [{}])[0].get("message", {}).get("content", "")
-            solution = self.extract_solution(task_id, content)
-            await self.sanitized_file.write(orjson.dumps({"task_id": task_id, "solution": solution}) + b"\n")
+                solution = asyncio.get_running_loop().create_future()
+                solution.set_result(self.extract_solution(task_id, content))
+                solutions.append(solution)
+        previous = self.sanitized_writes.get(task_id)
+        self.sanitized_writes[task_id] = asyncio.create_task(self._write_solutions(task_id, solutions, previous))
+        return self.sanitized_writes[task_id]
+
+    async def _write_solutions(
+        self, task_id: str, solutions: list[asyncio.Future[str]], previous: asyncio.Task | None
+    ) -> list[str]:
+        results = await asyncio.gather(*solutions)
+        if previous is not None:
+            await previous
+        for solution in results:
+            await self.writer.write(
+                self.sanitized_path, orjson.dumps({"task_id": task_id, "solution": solution}) + b"\n"
+            )
+        return results
 
     def __len__(self) -> int:
         r"""Get number of tasks in the dataset."""
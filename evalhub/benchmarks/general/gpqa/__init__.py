@@ -5,7 +5,7 @@ from typing import Any
 from datasets import load_dataset
 
 from evalhub.benchmarks.base import GroundTruth, Task
-from evalhub.benchmarks.math.base import MathDataset
+from evalhub.benchmarks.math.base import MathDataset, answer_line_stop_reason
 from evalhub.benchmarks.registry import register_dataset
 
 GPQA = "gpqa"
@@ -71,6 +71,10 @@ class GPQADataset(MathDataset):
         match = re.search(ANSWER_PATTERN_MULTICHOICE, response)
         return match.group(1) if match else None
 
+    def stop_reason(self, response: str) -> str | None:
+        r"""Stop once the final answer line is complete."""
+        return answer_line_stop_reason(response, ANSWER_PATTERN_MULTICHOICE)
+
     def check_correct(self, extracted_answer: str | None, ground_truth: str, task_id: str = None) -> bool:
         r"""Check if the extracted answer is correct."""
         if extracted_answer is None:
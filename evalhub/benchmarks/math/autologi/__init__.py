@@ -91,3 +91,7 @@ class AutoLogiDataset(MathDataset):
         r"""Extract the answer from the response."""
         match = re.search(ANSWER_PATTERN, response, re.DOTALL)
         return match.group(1).strip() if match else None
+
+    def stop_reason(self, response: str) -> str | None:
+        r"""Answers are not boxed, never stop early."""
+        return None
@@ -1,3 +1,4 @@
+import re
 from collections import defaultdict
 from os import PathLike
 from pathlib import Path
@@ -7,13 +8,23 @@ import orjson
 
 from evalhub.benchmarks.base import Dataset
 from evalhub.benchmarks.math.verifier import extract_answer, grade_answer
+from evalhub.benchmarks.math.verifier.rllm import last_boxed_only_string
 from evalhub.utils.logger import logger
-from evalhub.utils.metrics import compute_pass_at_k, get_majority_vote
+from evalhub.utils.metrics import compute_pass_at_k, get_majority_vote, pass_at_k_posterior
 from evalhub.utils.pbar import get_progress_bar
 
 DEFAULT_KS = [2**i for i in range(11)]
 
 
+def answer_line_stop_reason(response: str, pattern: str) -> str | None:
+    r"""Stop once a complete final answer line matching ``pattern`` follows the think block."""
+    if "<think>" in response and "</think>" not in response:
+        return None
+    answer = response.rpartition("</think>")[-1]
+    match = re.search(pattern, answer)
+    return "answer_line" if match and "\n" in answer[match.end() :] else None
+
+
 class MathDataset(Dataset):
     r"""Dataset class for math reasoning problems."""
 
@@ -32,6 +43,13 @@ class MathDataset(Dataset):
         r"""Extract the solution from the response."""
         return extract_answer(response) or ""
 
+    def stop_reason(self, response: str) -> str | None:
+        r"""Stop once a closed ``\boxed{}`` answer follows the think block."""
+        _, think_end, answer = response.rpartition("</think>")
+        if think_end and last_boxed_only_string(answer) is not None:
+            return "boxed_answer"
+        return None
+
     def check_correct(self, extracted_answer: str, ground_truth: str, task_id: str = None) -> bool:
         r"""Check if the extracted answer is correct."""
         return grade_answer(extracted_answer, ground_truth) or self.patch(extracted_answer, ground_truth, task_id)
@@ -54,6 +72,14 @@ class MathDataset(Dataset):
 
         return solutions
 
+    def _load_stopped_tasks(self, generation_dir: Path) -> set[str]:
+        r"""Tasks that adaptive sampling stopped early, from the sample counts saved next to the solutions."""
+        path = generation_dir / f"{self.name}_samples.json"
+        if not path.exists():
+            return set()
+        counts = orjson.loads(path.read_bytes())
+        return {task_id for task_id, count in counts.items() if count["stopped_early"]}
+
     def evaluate(self, solution: PathLike, output_dir: PathLike) -> None:
         r"""Evaluate the solution."""
         output_dir = Path(output_dir)
@@ -65,6 +91,10 @@ class MathDataset(Dataset):
         )
 
         results, correct, total = [], 0, len(id2solutions)
+        # Adaptive sampling draws fewer samples for settled tasks, report every k up to the largest count
+        max_samples = max(len(solutions) for solutions in id2solutions.values())
+        ks = [k for k in DEFAULT_KS if k <= max_samples]
+        stopped = self._load_stopped_tasks(Path(solution).parent)
         progress = get_progress_bar()
         with progress:
             eval_task = progress.add_task("[bold blue]Evaluating", total=total)
@@ -75,10 +105,12 @@ class MathDataset(Dataset):
 
                 # Calculate pass@k metrics
                 pass_at_k = defaultdict(float)
-                for k in DEFAULT_KS:
-                    if k > len(solutions):
-                        continue
-                    pass_at_k[str(k)] = compute_pass_at_k(len(solutions), sum(is_correct), k)
+                for k in ks:
+                    if k <= len(solutions):
+                        pass_at_k[str(k)] = compute_pass_at_k(len(solutions), sum(is_correct), k)
+                    elif task_id in stopped:
+                        # Adaptive sampling stopped the task once this posterior mean was settled
+                        pass_at_k[str(k)] = pass_at_k_posterior(len(solutions), sum(is_correct), k)[0]
 
                 # Calculate majority vote
                 majority_vote = get_majority_vote(solutions)
@@ -87,6 +119,7 @@ class MathDataset(Dataset):
                 result = {
                     "task_id": task_id,
                     "solutions": solutions,
+                    "num_samples": len(solutions),
                     "ground_truth": self.groundtruth[task_id].answer,
                     "correct": is_correct,
                     "pass_at_k": pass_at_k,
@@ -98,16 +131,19 @@ class MathDataset(Dataset):
                 results.append(result)
                 correct += int(is_correct_majority)
 
-        # Calculate aggregate metrics
-        pass_at_k = {
-            k: sum(result["pass_at_k"].get(k, 0) for result in results) / total for k in results[0]["pass_at_k"]
-        }
+        # Calculate aggregate metrics, over the tasks with enough samples or stopped early
+        pass_at_k = {}
+        for k in ks:
+            values = [result["pass_at_k"][str(k)] for result in results if str(k) in result["pass_at_k"]]
+            if len(values) < total:
+                logger.warning(f"Pass@{k} covers {len(values)} of {total} tasks, the others have fewer samples")
+            pass_at_k[str(k)] = sum(values) / len(values)
         cons_at_k = correct / total
 
         # Log metrics
         for k, value in pass_at_k.items():
             logger.info(f"Pass@{k}: {value:.2%}")
-        logger.info(f"Cons@{len(results[0]['solutions'])}: {cons_at_k:.2%}")
+        logger.info(f"Cons@{max_samples}: {cons_at_k:.2%}")
 
         # Save detailed results
         result_path = output_dir / f"{self.name}_results.jsonl"
@@ -107,6 +107,10 @@ class ZebraLogicDataset(MathDataset):
     def extract_solution(self, task_id: str, response: str | None) -> str:
         return response or ""
 
+    def stop_reason(self, response: str) -> str | None:
+        r"""Answers are not boxed, never stop early."""
+        return None
+
     def check_correct(self, extracted_answer: str, ground_truth: str, task_id: str = None) -> bool:
         ground_truth = self.build_solution(json.loads(ground_truth))
         try:
@@ -35,8 +35,7 @@ def gen(
     r"""Run generation on a model with specified dataset."""
     console.print(config)
     config.output_dir.mkdir(parents=True, exist_ok=True)
-    for task in config.tasks:
-        generate(config=config, task=task, override_args=override_args)
+    generate(config=config, tasks=config.tasks, override_args=override_args)
 
 
 @app.command()
@@ -67,6 +66,7 @@ def view(
     Automatically detects the result format:
     - JSONL files: Math evaluation results (GSM8K, etc.)
     - JSON files: LiveCodeBench results
+    - {task}_raw.jsonl and {task}_raw.jsonl.zst files: raw generation samples
     """
     view_results(
         results_path=Path(results),
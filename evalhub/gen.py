@@ -1,17 +1,24 @@
+import copy
+
 from evalhub.benchmarks import DATASET_MAP
 from evalhub.benchmarks.base import Dataset
 from evalhub.inference.generator import LLMGenerator
 from evalhub.inference.multiturn import MultiTurnGenerator
+from evalhub.inference.scheduler import Job
 from evalhub.inference.schemas import GenerationConfig
 from evalhub.utils.logger import logger
 
 
-def generate(config: GenerationConfig, task: str, override_args: str | None) -> None:
-    r"""Generate results for a given model and dataset."""
+def load_dataset(config: GenerationConfig, task: str, override_args: str | None) -> Dataset:
+    r"""Load a dataset for generation."""
     assert task in DATASET_MAP, f"Dataset {task} not supported for generation"
     dataset: Dataset = DATASET_MAP[task](name=task, config=config, override_args=override_args)
     logger.info(f"Successfully loaded {task} dataset, length: {len(dataset)}")
+    return dataset
+
 
+def make_job(config: GenerationConfig, dataset: Dataset) -> Job:
+    r"""Create the generation job of a dataset, resolving its system prompt."""
     if config.system_prompt == "":
         system_prompt = None
     else:
@@ -19,16 +26,34 @@ def generate(config: GenerationConfig, task: str, override_args: str | None) ->
 
     # NOTE: This will override the system prompt in the dataset
     if system_prompt:
-        logger.info(f"Using system prompt:\n{system_prompt}")
+        logger.info(f"Using system prompt for {dataset.name} in {config.output_dir}:\n{system_prompt}")
     else:
-        logger.info("Not using system prompt!")
+        logger.info(f"Not using system prompt for {dataset.name} in {config.output_dir}!")
+    config.output_dir.mkdir(parents=True, exist_ok=True)
+    return Job(dataset, system_prompt, config.sampling_params)
+
+
+def generate(config: GenerationConfig, tasks: list[str], override_args: str | None) -> None:
+    r"""Generate results for the given models and datasets, all datasets share one worker pool.
+
+    With several models or a sweep, every variant of a dataset reuses the loaded dataset and writes
+    to its own output directory.
+    """
+    variants = config.variants()
+    jobs = []
+    for task in tasks:
+        dataset = load_dataset(config, task, override_args)
+        for variant in variants:
+            variant_dataset = dataset if variant is config else copy.copy(dataset)
+            variant_dataset.config = variant
+            jobs.append(make_job(variant, variant_dataset))
 
     if config.enable_multiturn:
-        generator = MultiTurnGenerator(config, system_prompt)
+        generator = MultiTurnGenerator(config)
     else:
-        generator = LLMGenerator(config, system_prompt)
+        generator = LLMGenerator(config)
 
     if config.resume:
         logger.info(f"Resuming generation from {config.output_dir}")
 
-    generator.generate(dataset)
+    generator.generate_jobs(jobs)
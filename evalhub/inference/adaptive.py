@@ -0,0 +1,72 @@
+import math
+from collections import Counter, defaultdict
+
+from evalhub.utils.metrics import pass_at_k_posterior
+
+
+def majority_confidence(counts: Counter) -> float:
+    r"""Posterior probability that the leading answer is the most likely one.
+
+    Adaptive-Consistency's Beta stopping criterion: with ``v1`` and ``v2`` votes for the top two
+    answers, the share ``p1 / (p1 + p2)`` has a ``Beta(v1 + 1, v2 + 1)`` posterior, and
+    ``P(p1 > p2) = P(Binomial(v1 + v2 + 1, 1/2) <= v1)``.
+    """
+    top = [count for _, count in counts.most_common(2)] + [0, 0]
+    v1, v2 = top[0], top[1]
+    n = v1 + v2 + 1
+    return sum(math.comb(n, i) for i in range(v1 + 1)) / 2**n
+
+
+class AdaptiveStopping:
+    r"""Stop sampling tasks whose majority vote and pass@k are settled.
+
+    Samples are graded as they land. After ``min_samples``, a task is stopped once its majority
+    vote is settled with probability ``confidence`` and the posterior standard deviation of its
+    pass@k is at most ``tolerance`` for every reported k, the powers of two up to ``max_k``. A
+    task whose pass@k for the largest k is settled within ``tolerance`` of 0 is stopped without a
+    settled vote, e.g. an impossible task spreading its samples over many wrong answers. Tasks that are still
+    uncertain keep sampling up to ``--n-samples``.
+    """
+
+    def __init__(self, min_samples: int = 8, tolerance: float = 0.05, confidence: float = 0.95, max_k: int = 1) -> None:
+        self.min_samples = min_samples
+        self.tolerance = tolerance
+        self.confidence = confidence
+        # the ks evaluation reports pass@k for, estimated from the posterior for tasks stopped before k samples
+        self.ks = [2**i for i in range(max_k.bit_length())]
+        self.answers: dict[str, Counter] = defaultdict(Counter)
+        self.num_samples: Counter[str] = Counter()
+        self.num_correct: Counter[str] = Counter()
+        self.stopped: set[str] = set()
+
+    def update(self, task_id: str, solution: str | None, correct: bool) -> bool:
+        r"""Add a graded sample, return whether the task has just been stopped."""
+        answers = self.answers[task_id]
+        if solution:
+            answers[solution] += 1
+        self.num_samples[task_id] += 1
+        self.num_correct[task_id] += int(correct)
+        if task_id in self.stopped:
+            return False
+        num_samples = self.num_samples[task_id]
+        if num_samples < self.min_samples:
+            return False
+        posteriors = [pass_at_k_posterior(num_samples, self.num_correct[task_id], k) for k in self.ks]
+        if any(std > self.tolerance for _, std in posteriors):
+            return False
+        # The vote of a task that is almost never correct cannot settle on the correct answer
+        if majority_confidence(answers) < self.confidence and posteriors[-1][0] > self.tolerance:
+            return False
+        self.stopped.add(task_id)
+        return True
+
+    def summary(self) -> dict[str, dict]:
+        r"""Per-task sample counts of this run, recorded next to the outputs."""
+        return {
+            task_id: {
+                "num_samples": self.num_samples[task_id],
+                "num_correct": self.num_correct[task_id],
+                "stopped_early": task_id in self.stopped,
+            }
+            for task_id in self.num_samples
+        }
@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import math
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Collection
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from evalhub.inference.errors import is_backend_failure
+from evalhub.utils.logger import logger
+
+
+@dataclass
+class Backend:
+    r"""State of a single OpenAI compatible server."""
+
+    url: str | None
+    outstanding: int = 0
+    latency: float | None = None
+    consecutive_failures: int = 0
+    down_until: float = 0.0
+    num_requests: int = 0
+    num_errors: int = 0
+    # Circuit breaker: outcomes of recent requests, whether the circuit is open, and whether a probe is in flight
+    outcomes: deque[bool] = field(default_factory=lambda: deque(maxlen=20))
+    tripped: bool = False
+    probing: bool = False
+    num_trips: int = 0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    @property
+    def available(self) -> bool:
+        r"""Whether the backend accepts new requests: closed circuit, or cooled down and not yet probed."""
+        return self.healthy and not self.probing
+
+    def expected_wait(self, default_latency: float) -> float:
+        r"""Expected time to serve one more request: queue length times smoothed latency."""
+        latency = self.latency if self.latency is not None else default_latency
+        return (self.outstanding + 1) * latency
+
+
+class LoadBalancer:
+    r"""Route requests to the least-loaded backend.
+
+    Load is the number of outstanding requests weighted by an EWMA of request latency. Requests
+    carrying an affinity key are pinned to a backend by rendezvous (consistent) hashing, so that
+    requests sharing a prompt prefix hit the same prefix cache, unless that backend holds more than
+    ``load_factor`` times its fair share of outstanding requests.
+
+    Each backend has a circuit breaker: it trips when a backend fails ``max_failures`` times in a
+    row or when at least ``error_rate`` of its recent requests failed. A tripped backend gets no
+    new requests for ``cooldown`` seconds while its in-flight requests drain, then a single probe
+    request closes the circuit on success or trips it again on failure. Dispatch pauses while every
+    circuit is open. Only backend failures count, not errors caused by the request itself.
+    """
+
+    def __init__(
+        self,
+        urls: list[str | None],
+        smoothing: float = 0.1,
+        max_failures: int = 3,
+        cooldown: float = 30.0,
+        load_factor: float = 1.25,
+        error_rate: float = 0.5,
+        min_requests: int = 10,
+    ) -> None:
+        self.backends = [Backend(url) for url in urls or [None]]
+        self.smoothing = smoothing
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.load_factor = load_factor
+        self.error_rate = error_rate
+        self.min_requests = min_requests
+
+    @staticmethod
+    def _rendezvous_score(key: str, backend: Backend) -> int:
+        return int.from_bytes(hashlib.md5(f"{key}@{backend.url}".encode()).digest()[:8], "big")
+
+    def select(self, affinity_key: str | None = None, exclude: Collection[str | None] | None = None) -> Backend | None:
+        r"""Pick the backend pinned to ``affinity_key``, or the healthy one with the lowest expected wait.
+
+        Backends whose URL is in ``exclude``, e.g. the one serving the request a hedge duplicates, are
+        only picked if no other backend is available. A tripped backend is only picked once cooled
+        down and not already probed, and ``None`` is returned while every circuit is open.
+        """
+        candidates = [backend for backend in self.backends if backend.available]
+        if not candidates:
+            return None
+        if exclude:
+            candidates = [backend for backend in candidates if backend.url not in exclude] or candidates
+        if len(candidates) == 1:
+            return candidates[0]
+        if affinity_key is not None:
+            # Consistent hashing with bounded loads: walk the key's preference list until a backend has room
+            total = sum(backend.outstanding for backend in candidates) + 1
+            bound = math.ceil(self.load_factor * total / len(candidates))
+            ranked = sorted(candidates, key=lambda backend: self._rendezvous_score(affinity_key, backend), reverse=True)
+            for backend in ranked:
+                if backend.outstanding < bound:
+                    return backend
+        latencies = [backend.latency for backend in candidates if backend.latency is not None]
+        # Backends without measurements yet are assumed to be the fastest so that they get explored
+        default_latency = min(latencies, default=1.0)
+        return min(candidates, key=lambda backend: backend.expected_wait(default_latency))
+
+    @asynccontextmanager
+    async def track(
+        self, affinity_key: str | None = None, exclude: Collection[str | None] | None = None
+    ) -> AsyncIterator[Backend]:
+        r"""Select a backend and account for one request sent to it.
+
+        Dispatch pauses while the circuit of every backend is open. Selecting a cooled down backend
+        and marking it as probed happen without yielding, so that it gets a single probe.
+        """
+        while (backend := self.select(affinity_key, exclude)) is None:
+            await asyncio.sleep(max(min(backend.down_until for backend in self.backends) - time.monotonic(), 0.5))
+        probe = backend.tripped and not backend.probing
+        if probe:
+            backend.probing = True
+        backend.outstanding += 1
+        backend.num_requests += 1
+        start = time.perf_counter()
+        try:
+            yield backend
+        except Exception as e:
+            self.on_error(backend, e, probe)
+            raise
+        else:
+            self.on_success(backend, time.perf_counter() - start, probe)
+        finally:
+            backend.outstanding -= 1
+            if probe:
+                backend.probing = False
+
+    def on_success(self, backend: Backend, latency: float, probe: bool = False) -> None:
+        if probe:
+            logger.info(f"Backend {backend.url} is back in rotation")
+            backend.tripped = False
+            backend.outcomes.clear()
+        backend.consecutive_failures = 0
+        if not backend.tripped:
+            backend.outcomes.append(True)
+        if backend.latency is None:
+            backend.latency = latency
+        else:
+            backend.latency += self.smoothing * (latency - backend.latency)
+
+    def on_error(self, backend: Backend, error: Exception, probe: bool = False) -> None:
+        backend.num_errors += 1
+        if not is_backend_failure(error):
+            return
+        backend.consecutive_failures += 1
+        if backend.tripped and not probe:
+            return  # a request sent before the circuit opened, draining
+        backend.outcomes.append(False)
+        failures = backend.outcomes.count(False)
+        if (
+            probe
+            or backend.consecutive_failures >= self.max_failures
+            or (len(backend.outcomes) >= self.min_requests and failures >= self.error_rate * len(backend.outcomes))
+        ):
+            self.trip(backend, error)
+
+    def trip(self, backend: Backend, error: Exception) -> None:
+        r"""Open the circuit of a backend for ``cooldown`` seconds."""
+        if not backend.tripped:
+            backend.num_trips += 1
+            logger.warning(
+                f"Backend {backend.url} failed {backend.outcomes.count(False)} of its last "
+                f"{len(backend.outcomes)} requests, pausing it for {self.cooldown}s: {error}"
+            )
+        backend.tripped = True
+        backend.down_until = time.monotonic() + self.cooldown
+
+    def report(self) -> None:
+        r"""Log per-backend request statistics."""
+        for backend in self.backends:
+            if len(self.backends) == 1 and not backend.num_trips:
+                return
+            latency = f"{backend.latency:.2f}s" if backend.latency is not None else "n/a"
+            logger.info(
+                f"Backend {backend.url}: {backend.num_requests} requests, {backend.num_errors} errors, "
+                f"circuit opened {backend.num_trips} times, latency EWMA {latency}"
+            )
@@ -0,0 +1,100 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+import orjson
+
+from evalhub.utils.logger import logger
+
+# Request parameters that do not change the response
+UNCACHED_PARAMS = ("timeout", "api_base")
+
+
+def cache_key(params: dict, sample_ids: tuple[str, ...] | None = None) -> str:
+    r"""Content hash of a request: model, messages, tool schemas, sampling and streaming parameters and sample index."""
+    request = {key: value for key, value in params.items() if key not in UNCACHED_PARAMS}
+    request["sample_ids"] = sample_ids
+    return hashlib.sha256(orjson.dumps(request, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+class ResponseCache:
+    r"""Content-addressed on-disk cache of API responses with size-bounded LRU eviction.
+
+    Responses are stored in a SQLite database keyed by :func:`cache_key`, so that identical requests
+    against the same model, e.g. temperature-0 regression runs, are served without calling the
+    server. Once the cache grows beyond ``max_size`` bytes, the least recently used responses are
+    evicted down to 90% of it. Lookups and stores are serialized by a lock, so that the generator
+    runs them in helper threads instead of blocking the event loop on disk I/O.
+    """
+
+    def __init__(self, path: Path, max_size: int) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_size = max_size
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, response BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self.db.commit()
+        self.size = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.tokens_saved = 0
+
+    def get(self, key: str) -> dict | None:
+        r"""Cached response of a request, or None on a miss."""
+        with self.lock:
+            row = self.db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.db.execute("UPDATE responses SET accessed = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+            response = orjson.loads(row[0])
+            self.hits += 1
+            self.tokens_saved += (response.get("usage") or {}).get("total_tokens") or 0
+        return response
+
+    def put(self, key: str, response: dict) -> None:
+        r"""Store a response, evicting the least recently used ones if the cache is full."""
+        data = orjson.dumps(response)
+        with self.lock:
+            previous = self.db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, data, len(data), time.time()),
+            )
+            self.size += len(data) - (previous[0] if previous else 0)
+            if self.size > self.max_size:
+                self._evict(int(self.max_size * 0.9))
+            self.db.commit()
+
+    def _evict(self, target: int) -> None:
+        rows = self.db.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall()
+        evicted = []
+        for key, size in rows:
+            if self.size <= target:
+                break
+            evicted.append((key,))
+            self.size -= size
+        self.db.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self.evictions += len(evicted)
+
+    def report(self) -> None:
+        r"""Log the cache hits, misses and tokens saved in this run."""
+        if self.hits or self.misses:
+            logger.info(
+                f"Response cache: {self.hits} hits, {self.misses} misses, {self.tokens_saved} tokens saved, "
+                f"{self.evictions} evicted, {self.size / 2**20:.1f}MB in {self.path}"
+            )
+
+    def close(self) -> None:
+        self.db.close()
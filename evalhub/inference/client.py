@@ -0,0 +1,148 @@
+import os
+from abc import ABC, abstractmethod
+from collections.abc import AsyncIterator
+
+import aiohttp
+import orjson
+from litellm import acompletion
+
+# Request fields that configure the client rather than the completion
+CLIENT_PARAMS = {"timeout", "api_base"}
+
+# litellm provider prefixes of OpenAI compatible servers, with their environment variables
+PROVIDERS = {
+    "hosted_vllm": ("HOSTED_VLLM_API_BASE", "HOSTED_VLLM_API_KEY"),
+    "openai": ("OPENAI_API_BASE", "OPENAI_API_KEY"),
+}
+
+
+class APIStatusError(Exception):
+    r"""Error response returned by the server."""
+
+    def __init__(self, status_code: int, message: str, retry_after: str | None = None) -> None:
+        super().__init__(f"Error code: {status_code} - {message}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class BaseClient(ABC):
+    r"""Base class for chat completion clients.
+
+    Clients take the sampling parameters, messages and ``api_base`` of a request and return the
+    response as a dict in the OpenAI ``ChatCompletion`` format.
+    """
+
+    def __init__(self, max_connections: int = 1024) -> None:
+        self.max_connections = max_connections
+
+    @abstractmethod
+    async def chat(self, params: dict) -> dict:
+        r"""Send a chat completion request."""
+        raise NotImplementedError("Subclass must implement chat method")
+
+    @abstractmethod
+    def stream(self, params: dict) -> AsyncIterator[dict]:
+        r"""Send a streamed chat completion request, yielding ``ChatCompletionChunk`` dicts."""
+        raise NotImplementedError("Subclass must implement stream method")
+
+    async def close(self) -> None:  # noqa: B027
+        r"""Release pooled connections."""
+
+
+class LiteLLMClient(BaseClient):
+    r"""Client routing requests through ``litellm``, supports every litellm provider."""
+
+    async def chat(self, params: dict) -> dict:
+        response = await acompletion(**params)
+        return response.model_dump()
+
+    async def stream(self, params: dict) -> AsyncIterator[dict]:
+        response = await acompletion(**params, stream=True, stream_options={"include_usage": True})
+        try:
+            async for chunk in response:
+                yield chunk.model_dump()
+        finally:
+            # Close the connection when the consumer stops early or is cancelled, so the server stops decoding
+            await response.aclose()
+
+
+class HTTPClient(BaseClient):
+    r"""Lean client for OpenAI compatible servers.
+
+    Posts to ``/chat/completions`` over a single pooled keep-alive connection pool and decodes the
+    response with orjson, skipping litellm's provider routing and response models.
+    """
+
+    def __init__(self, max_connections: int = 1024) -> None:
+        super().__init__(max_connections)
+        self._session: aiohttp.ClientSession | None = None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+    @staticmethod
+    def resolve(params: dict) -> tuple[str, str, str | None]:
+        r"""Resolve the model name, base URL and API key of a request."""
+        model = params["model"]
+        provider, _, name = model.partition("/")
+        base_env, key_env = PROVIDERS.get(provider, PROVIDERS["openai"])
+        if provider in PROVIDERS:
+            model = name
+        api_base = params.get("api_base") or os.environ.get(base_env) or os.environ.get("OPENAI_BASE_URL")
+        assert api_base, f"No API base for {params['model']}, pass --api-base or set {base_env}"
+        return model, api_base.rstrip("/"), os.environ.get(key_env)
+
+    def _request(self, params: dict, **extra) -> dict:
+        r"""Build the keyword arguments of the POST request."""
+        model, api_base, api_key = self.resolve(params)
+        payload = {key: value for key, value in params.items() if key not in CLIENT_PARAMS and value is not None}
+        payload.update(payload.pop("extra_body", None) or {})  # sent as top-level fields, like the OpenAI SDK
+        payload.update(model=model, **extra)
+        headers = {"Content-Type": "application/json"}
+        if api_key:
+            headers["Authorization"] = f"Bearer {api_key}"
+        return {
+            "url": f"{api_base}/chat/completions",
+            "data": orjson.dumps(payload),
+            "headers": headers,
+            "timeout": aiohttp.ClientTimeout(total=params.get("timeout")),
+        }
+
+    async def chat(self, params: dict) -> dict:
+        async with self.session.post(**self._request(params)) as response:
+            body = await response.read()
+        if response.status != 200:
+            raise APIStatusError(response.status, body.decode(errors="replace"), response.headers.get("Retry-After"))
+        return orjson.loads(body)
+
+    async def stream(self, params: dict) -> AsyncIterator[dict]:
+        request = self._request(params, stream=True, stream_options={"include_usage": True})
+        async with self.session.post(**request) as response:
+            if response.status != 200:
+                body = await response.read()
+                raise APIStatusError(
+                    response.status, body.decode(errors="replace"), response.headers.get("Retry-After")
+                )
+            async for line in response.content:
+                line = line.strip()
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    break
+                yield orjson.loads(data)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+CLIENTS: dict[str, type[BaseClient]] = {
+    "litellm": LiteLLMClient,
+    "http": HTTPClient,
+}
@@ -0,0 +1,179 @@
+import asyncio
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+from evalhub.inference.errors import is_congestion_error
+from evalhub.utils.logger import logger
+
+
+@dataclass
+class RequestProbe:
+    r"""Per-request measurements reported back to the limiter."""
+
+    start: float = field(default_factory=time.perf_counter)
+    queue_time: float = 0.0
+    ttft: float | None = None
+    completion_tokens: int = 0
+
+    @property
+    def latency(self) -> float:
+        return time.perf_counter() - self.start
+
+
+class ConcurrencyLimiter:
+    r"""Bound the number of in-flight requests to a fixed limit."""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = float(max(limit, 1))
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    @property
+    def max_in_flight(self) -> int:
+        return max(int(self.limit), 1)
+
+    async def acquire(self) -> None:
+        r"""Wait for a free slot. Slots are handed over to waiters in FIFO order."""
+        if not self._waiters and self.in_flight < self.max_in_flight:
+            self.in_flight += 1
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()  # the slot was handed over right before cancellation
+            raise
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake_waiters()
+
+    def _wake_waiters(self) -> None:
+        while self._waiters and self.in_flight < self.max_in_flight:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    @asynccontextmanager
+    async def track(self) -> AsyncIterator[RequestProbe]:
+        r"""Hold a slot for the duration of one request and report its outcome."""
+        start = time.perf_counter()
+        await self.acquire()
+        probe = RequestProbe(queue_time=time.perf_counter() - start)
+        try:
+            yield probe
+        except Exception as e:
+            self.on_error(e, probe)
+            raise
+        else:
+            self.on_success(probe)
+        finally:
+            self.release()
+
+    def on_success(self, probe: RequestProbe) -> None:
+        r"""Hook called after a successful request."""
+
+    def on_error(self, error: Exception, probe: RequestProbe) -> None:
+        r"""Hook called after a failed request."""
+
+    def on_timeout(self) -> None:
+        r"""Hook called when a sample exceeds the generation timeout."""
+
+    def report(self) -> None:
+        r"""Log a summary of the limiter state."""
+
+
+class AdaptiveConcurrencyLimiter(ConcurrencyLimiter):
+    r"""AIMD concurrency limiter driven by request latency, throttling errors and timeouts.
+
+    The limit grows by one per success until the first congestion signal (slow start), then by
+    ``1 / limit`` per success. Congestion halves the limit, at most once per ``cooldown`` seconds.
+    Congestion is signalled by 408/429/503/504 errors, timeouts, or a smoothed latency (TTFT when
+    available, otherwise latency per completion token) exceeding ``latency_tolerance`` times the
+    best latency observed so far.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        initial_limit: int = 16,
+        backoff: float = 0.5,
+        latency_tolerance: float = 3.0,
+        cooldown: float = 5.0,
+        smoothing: float = 0.05,
+    ) -> None:
+        super().__init__(min(initial_limit, max_limit))
+        self.max_limit = max(max_limit, 1)
+        self.min_limit = max(min(min_limit, self.max_limit), 1)
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+        self.slow_start = True
+        self.min_latency: float | None = None
+        self.smoothed_latency: float | None = None
+        self.settled_limit = self.limit
+        self.peak_limit = self.limit
+        self.num_decreases = 0
+        self._last_decrease = 0.0
+
+    def _set_limit(self, limit: float) -> None:
+        self.limit = min(max(limit, self.min_limit), self.max_limit)
+        self.peak_limit = max(self.peak_limit, self.limit)
+        self._wake_waiters()
+
+    def _decrease(self, reason: str) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.slow_start = False
+        self.num_decreases += 1
+        previous = self.max_in_flight
+        self._set_limit(self.limit * self.backoff)
+        # Forget the latency history of the congested period
+        self.smoothed_latency = None
+        logger.debug(f"Concurrency limit {previous} -> {self.max_in_flight} ({reason})")
+
+    def _observe_latency(self, probe: RequestProbe) -> bool:
+        r"""Update latency statistics, return whether the latency indicates congestion."""
+        if probe.ttft is not None:
+            latency = probe.ttft
+        else:
+            latency = probe.latency / max(probe.completion_tokens, 1)
+        self.min_latency = latency if self.min_latency is None else min(self.min_latency, latency)
+        if self.smoothed_latency is None:
+            self.smoothed_latency = latency
+        else:
+            self.smoothed_latency += self.smoothing * (latency - self.smoothed_latency)
+        return self.smoothed_latency > self.latency_tolerance * self.min_latency
+
+    def on_success(self, probe: RequestProbe) -> None:
+        if self._observe_latency(probe):
+            self._decrease("latency")
+        elif self.slow_start:
+            self._set_limit(self.limit + 1)
+        else:
+            self._set_limit(self.limit + 1 / self.limit)
+        self.settled_limit += self.smoothing * (self.limit - self.settled_limit)
+
+    def on_error(self, error: Exception, probe: RequestProbe) -> None:
+        if is_congestion_error(error):
+            self._decrease(type(error).__name__)
+
+    def on_timeout(self) -> None:
+        self._decrease("timeout")
+
+    def report(self) -> None:
+        logger.info(
+            f"Adaptive concurrency settled at {round(self.settled_limit)} "
+            f"(peak {int(self.peak_limit)}, ceiling {self.max_limit}, {self.num_decreases} decreases), "
+            f"pass --num-workers {round(self.settled_limit)} to reuse it"
+        )
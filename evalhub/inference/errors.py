@@ -0,0 +1,65 @@
+import email.utils
+import random
+import time
+
+# Error classes, deciding how a failed request is retried
+FATAL = "fatal"  # the request itself is invalid (context length, malformed request, auth), never retried
+RETRYABLE = "retryable"  # transient backend failure (connection reset, 5xx), retried with exponential backoff
+THROTTLE = "throttle"  # the backend is overloaded, retried after a pause without using the retry budget
+
+THROTTLE_STATUS_CODES = {408, 429, 503, 504}
+
+# Retry budgets per request, throttled requests get a separate and larger one
+MAX_RETRIES = {RETRYABLE: 2, THROTTLE: 8}
+MAX_BACKOFF = {RETRYABLE: 10.0, THROTTLE: 60.0}
+
+
+class EmptyResponseError(Exception):
+    r"""Response without any choice, retried as a transient failure."""
+
+
+def classify_error(error: BaseException) -> str:
+    r"""Classify an API error as ``FATAL``, ``RETRYABLE`` or ``THROTTLE``."""
+    if isinstance(error, TimeoutError) or "Timeout" in type(error).__name__:
+        return THROTTLE
+    status_code = getattr(error, "status_code", None)
+    if status_code in THROTTLE_STATUS_CODES:
+        return THROTTLE
+    if isinstance(status_code, int) and 400 <= status_code < 500:
+        return FATAL
+    return RETRYABLE
+
+
+def is_congestion_error(error: BaseException) -> bool:
+    r"""Whether an API error indicates that the server is overloaded."""
+    return classify_error(error) == THROTTLE
+
+
+def is_backend_failure(error: BaseException) -> bool:
+    r"""Whether an API error is caused by the backend rather than by the request."""
+    return classify_error(error) != FATAL
+
+
+def retry_after(error: BaseException) -> float | None:
+    r"""Seconds to wait before retrying, from the ``Retry-After`` header of the error response if any."""
+    value = getattr(error, "retry_after", None)
+    if value is None:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff(error: BaseException, kind: str, attempt: int) -> float:
+    r"""Seconds to wait before retry number ``attempt``: ``Retry-After`` if given, else jittered exponential."""
+    if (delay := retry_after(error)) is not None:
+        return min(delay, MAX_BACKOFF[kind])
+    return min(2**attempt, MAX_BACKOFF[kind]) * random.uniform(0.5, 1.5)
@@ -0,0 +1,73 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from evalhub.benchmarks.base import Dataset
+
+# Extractions queued per worker process before saving waits for a free slot
+MAX_PENDING_PER_WORKER = 16
+
+# Datasets of an extraction worker process, by name
+_DATASETS: dict[str, Dataset] = {}
+
+
+def _init_worker(datasets: list[Dataset]) -> None:
+    _DATASETS.update((dataset.name, dataset) for dataset in datasets)
+
+
+def _extract_solution(name: str, task_id: str, content: str) -> str:
+    return _DATASETS[name].extract_solution(task_id, content)
+
+
+def _check_correct(name: str, task_id: str, solution: str, ground_truth: str) -> bool:
+    return bool(_DATASETS[name].check_correct(solution, ground_truth, task_id))
+
+
+class ExtractionPool:
+    r"""Extract solutions in worker processes, off the event loop.
+
+    Sanitizers (tree-sitter, evalplus) and regex scans over long responses would otherwise stall
+    every in-flight request while they run. Each worker process receives the datasets once at
+    startup, pickled without their open files. Workers are started by a fork server, or spawned
+    where there is none, as forking the generating process would copy its running event loop and
+    the locks of its writer threads. At most
+    ``MAX_PENDING_PER_WORKER`` extractions per worker are queued, submitting more waits for a free
+    slot, which slows down saving rather than growing the queue.
+    """
+
+    def __init__(self, datasets: list[Dataset], max_workers: int) -> None:
+        unique = {dataset.name: dataset for dataset in datasets}
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context("forkserver")
+            # Import the benchmarks once in the fork server rather than in every worker
+            context.set_forkserver_preload([__name__])
+        else:
+            context = multiprocessing.get_context("spawn")
+        self.executor = ProcessPoolExecutor(
+            max_workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(list(unique.values()),),
+        )
+        # Start a worker while the datasets are loaded, instead of delaying the first extraction
+        self.executor.submit(int)
+        self.slots = asyncio.Semaphore(max_workers * MAX_PENDING_PER_WORKER)
+
+    async def submit(self, name: str, task_id: str, content: str) -> asyncio.Future[str]:
+        r"""Queue the extraction of a solution, waiting while the queue is full."""
+        await self.slots.acquire()
+        future = asyncio.get_running_loop().run_in_executor(self.executor, _extract_solution, name, task_id, content)
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    async def check_correct(self, name: str, task_id: str, solution: str, ground_truth: str) -> bool:
+        r"""Grade an extracted solution, e.g. for adaptive sampling, in a worker process.
+
+        Verifiers may run for seconds or set ``SIGALRM`` timeouts, so they cannot run on the event
+        loop nor in a helper thread. Grading follows an extraction and needs no queue slot of its own.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, _check_correct, name, task_id, solution, ground_truth)
+
+    def shutdown(self) -> None:
+        self.executor.shutdown()
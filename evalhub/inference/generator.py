@@ -1,18 +1,85 @@
 import asyncio
-import random
-from collections import defaultdict
-from dataclasses import asdict
+import contextlib
+import contextvars
+import statistics
+from collections import Counter, defaultdict
+from contextlib import aclosing
+from dataclasses import asdict, dataclass, replace
 from pathlib import Path
 
 import orjson
-from litellm import acompletion
-from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
 
-from evalhub.benchmarks.base import Dataset
-from evalhub.inference.schemas import GenerationConfig
+from evalhub.benchmarks.base import Dataset, Task
+from evalhub.inference.adaptive import AdaptiveStopping
+from evalhub.inference.balancer import LoadBalancer
+from evalhub.inference.cache import ResponseCache, cache_key
+from evalhub.inference.client import CLIENTS
+from evalhub.inference.concurrency import AdaptiveConcurrencyLimiter, ConcurrencyLimiter, RequestProbe
+from evalhub.inference.errors import (
+    FATAL,
+    MAX_RETRIES,
+    RETRYABLE,
+    THROTTLE,
+    EmptyResponseError,
+    backoff,
+    classify_error,
+)
+from evalhub.inference.extraction import ExtractionPool
+from evalhub.inference.hedging import HEDGED, SERVING_BACKENDS, HedgePolicy
+from evalhub.inference.lengths import LengthDatabase, expected_length, model_family, token_cap
+from evalhub.inference.manifest import (
+    build_manifest,
+    load_manifest,
+    manifest_mismatches,
+    manifest_path,
+    write_manifest,
+)
+from evalhub.inference.ratelimit import RateLimiter, estimate_prompt_tokens, estimate_tokens
+from evalhub.inference.raw import iter_raw, raw_path
+from evalhub.inference.scheduler import (
+    CURRENT_JOB,
+    MAX_REQUEUE_ATTEMPTS,
+    Job,
+    WorkItem,
+    WorkQueue,
+    iter_job_work_items,
+)
+from evalhub.inference.schemas import RAW_FORMATS, GenerationConfig, SamplingParams
+from evalhub.inference.streaming import REASONING_FIELDS, StreamAssembler
+from evalhub.inference.telemetry import Telemetry
 from evalhub.utils.logger import logger
 from evalhub.utils.pbar import get_progress_bar
 
+# Request timeout of the current pass, raised in the final passes over failed samples
+REQUEST_TIMEOUT: contextvars.ContextVar[int | None] = contextvars.ContextVar("request_timeout", default=None)
+# Sample ids of the current request, part of the response cache key so that samples of a task stay distinct
+SAMPLE_IDS: contextvars.ContextVar[tuple[str, ...] | None] = contextvars.ContextVar("sample_ids", default=None)
+# Per-task max_completion_tokens of the current request, from recorded completion lengths
+TOKEN_CAP: contextvars.ContextVar[int | None] = contextvars.ContextVar("token_cap", default=None)
+# Partial streamed responses of the current request by choice index, kept when it times out to be continued
+PARTIALS: contextvars.ContextVar[dict[int, dict] | None] = contextvars.ContextVar("partials", default=None)
+# Error class of each failed sample of the current work item, so that the retry passes skip fatal errors
+FAILURES: contextvars.ContextVar[dict[str, str] | None] = contextvars.ContextVar("failures", default=None)
+
+# Request fields making the server extend the final assistant message instead of starting a new one
+CONTINUATION_PARAMS = {"continue_final_message": True, "add_generation_prompt": False}
+USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "total_tokens")
+
+
+def share_usage(usage: dict | None, position: int, num_choices: int) -> dict | None:
+    r"""Share of one choice in the usage of a request, the shares of all choices add up to the usage."""
+    if not usage:
+        return usage
+    share = {}
+    for key, value in usage.items():
+        if isinstance(value, dict):
+            share[key] = share_usage(value, position, num_choices)
+        elif isinstance(value, int):
+            share[key] = value // num_choices + (position < value % num_choices)
+        else:
+            share[key] = value
+    return share
+
 
 class ProgressTracker:
     r"""Optimized progress tracking for generation tasks."""
@@ -35,9 +102,9 @@ class ProgressTracker:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.progress.__exit__(exc_type, exc_val, exc_tb)
 
-    def update_sample_progress(self):
+    def update_sample_progress(self, advance: int = 1):
         r"""Update sample completion progress."""
-        self.completed_samples += 1
+        self.completed_samples += advance
         self.progress.update(self.sample_progress, completed=self.completed_samples)
 
     def update_task_progress(self):
@@ -46,42 +113,272 @@ class ProgressTracker:
         self.progress.update(self.task_progress, completed=self.completed_tasks)
 
 
+class UsageTracker:
+    r"""Accumulate the token usage reported by the server."""
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.completion_tokens = 0
+        self.early_stops: Counter[str] = Counter()
+        self.retries: Counter[str] = Counter()
+        self.continuations: Counter[int] = Counter()  # samples by number of continuation requests
+
+    def update(self, usage: dict | None):
+        r"""Add the usage of one response."""
+        if not usage:
+            return
+        self.prompt_tokens += usage.get("prompt_tokens") or 0
+        self.completion_tokens += usage.get("completion_tokens") or 0
+        self.cached_prompt_tokens += (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+
+    def report(self):
+        r"""Log token usage and the prefill tokens saved by the prefix cache."""
+        if self.early_stops:
+            logger.info(f"Stopped {self.early_stops.total()} samples early: {dict(self.early_stops)}")
+        if self.retries:
+            logger.info(f"Retried {self.retries.total()} requests: {dict(self.retries)}")
+        if self.continuations:
+            hops = dict(sorted(self.continuations.items()))
+            logger.info(f"Continued {self.continuations.total()} unfinished samples, by continuation requests: {hops}")
+        if self.prompt_tokens == 0:
+            return
+        logger.info(
+            f"Used {self.prompt_tokens} prompt and {self.completion_tokens} completion tokens, "
+            f"prefix cache saved {self.cached_prompt_tokens} prefill tokens "
+            f"({self.cached_prompt_tokens / self.prompt_tokens:.2%})"
+        )
+
+
+class TimingTracker:
+    r"""Collect per-sample latency breakdowns of streamed requests."""
+
+    def __init__(self):
+        self.samples: dict[str, list[float]] = defaultdict(list)
+
+    def update(self, timings: list[dict[str, float | None]]):
+        r"""Add the timing of every choice of one response."""
+        for timing in timings:
+            for key in ("queue_time", "ttft", "decode_time", "tokens_per_second"):
+                if timing.get(key) is not None:
+                    self.samples[key].append(timing[key])
+
+    def report(self):
+        r"""Log the median and 90th percentile of each latency component."""
+        for key, values in self.samples.items():
+            if len(values) < 2:
+                continue
+            quantiles = statistics.quantiles(values, n=10)
+            logger.info(f"{key}: p50 {statistics.median(values):.3f}, p90 {quantiles[-1]:.3f}")
+
+
+@dataclass
+class Endpoint:
+    r"""Servers, concurrency limit and rate limits of one model, the models of a run share its workers."""
+
+    balancer: LoadBalancer
+    limiter: ConcurrencyLimiter
+    rate_limiter: RateLimiter
+
+    @classmethod
+    def from_config(cls, config: GenerationConfig, model: str) -> "Endpoint":
+        if config.adaptive_concurrency:
+            limiter = AdaptiveConcurrencyLimiter(config.num_workers)
+        else:
+            limiter = ConcurrencyLimiter(config.num_workers)
+        rate_limiter = RateLimiter(config.rpm_limit, config.tpm_limit)
+        return cls(LoadBalancer(config.model_api_base(model)), limiter, rate_limiter)
+
+
 class LLMGenerator:
-    r"""High-performance class for generating responses via OpenAI Compatible APIs."""
+    r"""High-performance class for generating responses via OpenAI Compatible APIs.
+
+    Each model of a multi-model run has its own :class:`Endpoint`, requests of a job go to the
+    endpoint of its model while all jobs share the worker pool.
+    """
 
     def __init__(self, config: GenerationConfig, system_prompt: str | None = None) -> None:
         self.config = config
         self.system_prompt = system_prompt
+        self.endpoints = {model: Endpoint.from_config(config, model) for model in config.models}
+        self.num_workers = config.num_workers * len(self.endpoints)
+        self.client = CLIENTS[config.client](max_connections=self.num_workers)
+        self.usage = UsageTracker()
+        self.timing = TimingTracker()
+        self.telemetry = Telemetry()
+        endpoints = self.endpoints.values()
+        self.telemetry.gauge("in_flight_requests", lambda: sum(endpoint.limiter.in_flight for endpoint in endpoints))
+        self.telemetry.gauge("concurrency_limit", lambda: sum(endpoint.limiter.limit for endpoint in endpoints))
+        self.samples_per_request = max(config.samples_per_request, 1)
+        self.hedge = HedgePolicy(config.hedge_percentile) if config.hedge_percentile > 0 else None
+        self.lengths = None
+        if config.schedule == "longest" or config.length_cap_headroom > 0:
+            self.lengths = LengthDatabase(config.cache_dir / "lengths.sqlite3")
+        self.cache = None
+        if config.response_cache:
+            self.cache = ResponseCache(config.response_cache_path, int(config.response_cache_size * 2**30))
 
     def _build_messages(self, prompt: str) -> list[dict[str, str]]:
         r"""Build message list for API call with caching optimization."""
-        if self.system_prompt:
+        job = CURRENT_JOB.get()
+        system_prompt = job.system_prompt if job is not None else self.system_prompt
+        if system_prompt:
             messages = [
-                {"role": "system", "content": self.system_prompt},
+                {"role": "system", "content": system_prompt},
                 {"role": "user", "content": prompt},
             ]
         else:
             messages = [{"role": "user", "content": prompt}]
         return messages
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-        retry=retry_if_exception_type(Exception),
-        reraise=True,
-    )
-    async def complete(self, messages: list[dict[str, str]], tools: list[dict[str, str]] | None = None) -> dict:
-        r"""Complete API call with automatic retry on failure."""
-        params = asdict(self.config.sampling_params)
+    async def complete(
+        self,
+        messages: list[dict[str, str]],
+        tools: list[dict[str, str]] | None = None,
+        affinity_key: str | None = None,
+        n: int = 1,
+        continuation: bool = False,
+    ) -> dict:
+        r"""Complete API call, retrying according to the class of the error.
+
+        Fatal errors (context length, malformed request) are raised at once, transient backend
+        failures are retried with exponential backoff, and throttled requests wait for
+        ``Retry-After`` and for a backend circuit to close, with a separate retry budget. The class
+        of the error a request finally fails with is recorded for its samples in ``FAILURES``.
+        Requests with the same ``affinity_key`` prefer the same backend to reuse its prefix cache.
+        With the response cache enabled, identical requests are answered from it. A ``continuation``
+        request extends the final assistant message of ``messages``.
+        """
+        key = None
+        if self.cache is not None:
+            params = {**asdict(self._sampling_params()), "messages": messages, "tools": tools, "n": n}
+            # Early stopped streams are cut short, so they are only replayed to runs stopping the same way
+            params.update(stream=self.config.stream, early_stop=self.config.early_stop)
+            key = cache_key(params, SAMPLE_IDS.get())
+            if (response := await asyncio.to_thread(self.cache.get, key)) is not None:
+                self.telemetry.inc("cache_hits_total")
+                # The latency of the original request says nothing about this run
+                response.pop("timing", None)
+                return response
+        attempts: Counter[str] = Counter()
+        while True:
+            try:
+                response = await self._complete(messages, tools, affinity_key, n, continuation)
+                break
+            except Exception as e:
+                kind = classify_error(e)
+                attempts[kind] += 1
+                self.telemetry.inc("request_errors_total", kind=kind)
+                if kind == FATAL or attempts[kind] > MAX_RETRIES[kind]:
+                    if (failures := FAILURES.get()) is not None:
+                        failures.update(dict.fromkeys(SAMPLE_IDS.get() or (), kind))
+                    raise
+                self.usage.retries[kind] += 1
+                self.telemetry.inc("retries_total", kind=kind)
+                await asyncio.sleep(backoff(e, kind, attempts[kind]))
+        if key is not None:
+            await asyncio.to_thread(self.cache.put, key, response)
+        return response
+
+    async def _complete(
+        self,
+        messages: list[dict[str, str]],
+        tools: list[dict[str, str]] | None = None,
+        affinity_key: str | None = None,
+        n: int = 1,
+        continuation: bool = False,
+    ) -> dict:
+        r"""Send a single request."""
+        params = asdict(self._sampling_params())
         params["messages"] = messages
+        if (timeout := REQUEST_TIMEOUT.get()) is not None:
+            params["timeout"] = timeout
         if tools:
             params["tools"] = tools
+        if n > 1:
+            params["n"] = n
+        if continuation:
+            params["extra_body"] = CONTINUATION_PARAMS
 
-        response = await acompletion(**params)
-        if response.choices[0].finish_reason == "length":
+        # Pace before taking a concurrency slot, so that throttled requests do not look slow to the limiter
+        estimated_tokens = estimate_tokens(params)
+        endpoint = self._endpoint()
+        await endpoint.rate_limiter.acquire(estimated_tokens)
+        usage = None
+        probe = None
+        try:
+            # The balancer waits for an available backend after the concurrency slot is taken
+            async with (
+                endpoint.limiter.track() as probe,
+                endpoint.balancer.track(affinity_key, exclude=HEDGED.get()) as backend,
+            ):
+                if (serving := SERVING_BACKENDS.get()) is not None:
+                    serving.add(backend.url)
+                if backend.url is not None:
+                    params["api_base"] = backend.url
+                if self.config.stream:
+                    response = await self._stream(params, probe, n)
+                else:
+                    response = await self.client.chat(params)
+                usage = response.get("usage")
+                probe.completion_tokens = (usage or {}).get("completion_tokens") or probe.completion_tokens
+                self.telemetry.observe_response(backend.url, probe.latency, response)
+        finally:
+            # Failed, timed out and early stopped requests report no usage, charge their prompt and streamed tokens
+            streamed = probe.completion_tokens if probe is not None else 0
+            consumed = estimate_prompt_tokens(params) + streamed
+            endpoint.rate_limiter.settle(estimated_tokens, (usage or {}).get("total_tokens"), consumed)
+        self.usage.update(usage)
+        if not response.get("choices"):  # e.g. filtered content, or a stream ended by an error chunk
+            raise EmptyResponseError(f"Response {response.get('id')} has no choices")
+        if response["choices"][0].get("finish_reason") == "length":
             logger.warning("Max tokens exceeded!")
+        if "timing" in response:
+            self.timing.update(response["timing"])
+            if n == 1:
+                response["timing"] = response["timing"][0]
+        return response
+
+    def _sampling_params(self) -> SamplingParams:
+        r"""Sampling parameters of the current job, which may be a sweep variant, with the task's token cap."""
+        job = CURRENT_JOB.get()
+        params = job.sampling_params if job is not None and job.sampling_params else self.config.sampling_params
+        if (cap := TOKEN_CAP.get()) is not None:
+            params = replace(params, max_completion_tokens=cap)
+        return params
 
-        return response.model_dump()
+    def _endpoint(self) -> Endpoint:
+        r"""Endpoint of the model of the current job."""
+        return self.endpoints[self._sampling_params().model]
+
+    async def _stream(self, params: dict, probe: RequestProbe, n: int = 1) -> dict:
+        r"""Stream a completion, assembling the chunks and recording per-choice timing.
+
+        With an early stop condition, the stream is cancelled as soon as every choice is done. When
+        the request is cancelled, e.g. by the timeout, the partial choices are kept for continuation.
+        """
+        assembler = StreamAssembler()
+        job = CURRENT_JOB.get()
+        stop_condition = job.stop_condition if job is not None else None
+        try:
+            async with aclosing(self.client.stream(params)) as chunks:
+                async for chunk in chunks:
+                    assembler.add(chunk)
+                    # About one token per chunk, counted for requests that end without usage
+                    probe.completion_tokens = sum(assembler.num_chunks.values())
+                    if probe.ttft is None and assembler.first_token:
+                        probe.ttft = min(assembler.first_token.values()) - assembler.start
+                    if stop_condition is not None and assembler.check_stop(stop_condition, n):
+                        break
+        except asyncio.CancelledError:
+            if (partials := PARTIALS.get()) is not None:
+                self._keep_partials(partials, assembler.build())
+            raise
+        for reason in assembler.stopped.values():
+            self.usage.early_stops[reason] += 1
+        response = assembler.build()
+        response["timing"] = assembler.timing(queue_time=probe.queue_time)
+        return response
 
     async def _generate_single_sample(
         self, task_id: str, sample_id: str, prompt: str, metadata: dict | None = None
@@ -89,90 +386,517 @@ class LLMGenerator:
         r"""Generate a single sample with automatic retry."""
         messages = self._build_messages(prompt)
         try:
-            response = await self.complete(messages)
+            response = await self.complete(messages, affinity_key=self._affinity_key(task_id))
             return (task_id, sample_id, response)
         except Exception as e:
             logger.error(f"Failed to process task {task_id} sample {sample_id}: {str(e)}")
             return (task_id, sample_id, None)
 
-    async def agenerate(self, dataset: Dataset) -> None:
-        r"""Generate responses asynchronously with optimized performance."""
+    async def _generate_samples(self, task: Task, sample_ids: list[str]) -> list[tuple[str, str, dict | None]]:
+        r"""Generate several samples of a task with a single request using the ``n`` parameter.
+
+        Returns one result per choice received, which may be fewer than ``sample_ids``.
+        """
+        if len(sample_ids) == 1:
+            return [await self._generate_single_sample(task.task_id, sample_ids[0], task.prompt, task.metadata)]
+        messages = self._build_messages(task.prompt)
+        try:
+            response = await self.complete(messages, affinity_key=self._affinity_key(task.task_id), n=len(sample_ids))
+        except Exception as e:
+            logger.error(f"Failed to process task {task.task_id} samples {sample_ids}: {str(e)}")
+            return [(task.task_id, sample_id, None) for sample_id in sample_ids]
+        records = self._split_choices(response)
+        return [(task.task_id, sample_id, record) for sample_id, record in zip(sample_ids, records, strict=False)]
+
+    @staticmethod
+    def _split_choices(response: dict) -> list[dict]:
+        r"""Split a response with several choices into single-choice responses.
+
+        Each record gets its share of the request's usage, so that summing the usage of the records
+        counts the request once, and ``num_choices`` records how many choices the request had.
+        """
+        choices = sorted(
+            (choice for choice in response.get("choices") or [] if choice.get("message") is not None),
+            key=lambda choice: choice.get("index", 0),
+        )
+        timing = response.get("timing")
+        return [
+            {
+                **response,
+                "choices": [{**choice, "index": 0}],
+                "usage": share_usage(response.get("usage"), position, len(choices)),
+                "num_choices": len(choices),
+                **({"timing": timing[choice.get("index", 0)]} if isinstance(timing, list) else {}),
+            }
+            for position, choice in enumerate(choices)
+        ]
+
+    def _keep_partials(self, partials: dict[int, dict], response: dict) -> None:
+        r"""Keep the longest partial content of each choice, over the hedged copies of a request."""
+        for index, record in enumerate(self._split_choices(response)):
+            content = record["choices"][0]["message"].get("content")
+            previous = partials.get(index)
+            if content and (previous is None or len(content) > len(previous["choices"][0]["message"]["content"])):
+                partials[index] = record
+
+    def _affinity_key(self, task_id: str) -> str | None:
+        r"""Backend affinity key of a task, only used by the prefix-cache-aware schedule.
+
+        Hedge requests get no key and exclude the backends serving their primary, so that they go to the
+        least loaded other backend instead of the straggling one.
+        """
+        return task_id if self.config.schedule == "prefix" and HEDGED.get() is None else None
+
+    async def _generate_with_timeout(
+        self, item: WorkItem, work: WorkQueue, capped: bool = True
+    ) -> list[tuple[str, str, dict | None]]:
+        r"""Generate the samples of a work item with timeout protection, hedging stragglers.
+
+        Samples cut short by a per-task token cap are continued with the rest of the full token budget,
+        or drawn again uncapped when they were cut inside the reasoning. With continuation enabled,
+        streamed samples cut by the timeout are returned with their partial content and no
+        ``finish_reason``.
+        """
+        SAMPLE_IDS.set(tuple(item.sample_ids))
+        partials: dict[int, dict] | None = {} if self.config.max_continuations > 0 else None
+        PARTIALS.set(partials)
+        cap = item.job.token_caps.get(item.task.task_id) if capped and item.job is not None else None
+        TOKEN_CAP.set(cap)
+        if self.hedge is None:
+            request = self._generate_samples(item.task, item.sample_ids)
+        else:
+            request = self.hedge.run(
+                lambda: self._generate_samples(item.task, item.sample_ids),
+                is_tail=lambda: work.exhausted,
+                succeeded=lambda results: any(response is not None for _, _, response in results),
+            )
+        timeout = REQUEST_TIMEOUT.get() or self._sampling_params().timeout
+        try:
+            results = await asyncio.wait_for(request, timeout=timeout)
+        except TimeoutError:
+            self._endpoint().limiter.on_timeout()
+            self.telemetry.inc("timeouts_total", len(item.sample_ids))
+            logger.warning(f"Task {item.task.task_id} samples {item.sample_ids} timed out after {timeout}s")
+            partials = partials or {}
+            if (failures := FAILURES.get()) is not None:
+                failures.update(
+                    {sample_id: THROTTLE for i, sample_id in enumerate(item.sample_ids) if i not in partials}
+                )
+            return [(item.task.task_id, sample_id, partials.get(i)) for i, sample_id in enumerate(item.sample_ids)]
+        if cap is None:
+            return results
+        truncated = {
+            sample_id: response
+            for _, sample_id, response in results
+            if response is not None and (response.get("choices") or [{}])[0].get("finish_reason") == "length"
+        }
+        if not truncated:
+            return results
+        # Continuing a sample keeps its length unbiased, drawing it again would favour shorter completions.
+        # Samples cut inside the reasoning have no content to continue from and are still drawn again.
+        continued = {
+            sample_id: response
+            for sample_id, response in truncated.items()
+            if response["choices"][0]["message"].get("content")
+        }
+        redrawn = truncated.keys() - continued.keys()
+        item.job.lengths.num_uncapped += len(continued)
+        item.job.lengths.num_redrawn += len(redrawn)
+        budget = (item.job.sampling_params or self.config.sampling_params).max_completion_tokens - cap
+        responses = await asyncio.gather(
+            *(self._uncap_sample(item.task, sample_id, response, budget) for sample_id, response in continued.items())
+        )
+        continued = dict(zip(continued, responses, strict=True))
+        kept = [
+            (task_id, sample_id, continued.get(sample_id, response))
+            for task_id, sample_id, response in results
+            if sample_id not in redrawn
+        ]
+        if not redrawn:
+            return kept
+        retry = WorkItem(item.task, sorted(redrawn, key=int), item.attempt, item.job)
+        return kept + await self._generate_with_timeout(retry, work, capped=False)
+
+    async def _worker(self, work: WorkQueue, results: asyncio.Queue, failed: list[WorkItem]) -> None:
+        r"""Pull work items from the shared queue until it is exhausted, collecting failed samples."""
+        for item in work:
+            if item.job is not None and item.job.is_stopped(item.task.task_id):
+                continue
+            CURRENT_JOB.set(item.job)
+            failures: dict[str, str] = {}
+            FAILURES.set(failures)
+            item_results = await self._generate_with_timeout(item, work)
+            if self.config.max_continuations > 0:
+                responses = await asyncio.gather(
+                    *(self._continue_sample(item.task, sample_id, response) for _, sample_id, response in item_results)
+                )
+                item_results = [
+                    (task_id, sample_id, response)
+                    for (task_id, sample_id, _), response in zip(item_results, responses, strict=True)
+                ]
+            received = {sample_id for _, sample_id, _ in item_results}
+            missing = [sample_id for sample_id in item.sample_ids if sample_id not in received]
+            if missing and item.attempt < MAX_REQUEUE_ATTEMPTS:
+                # Only the samples missing from a partial response are requested again
+                work.requeue(WorkItem(item.task, missing, item.attempt, item.job))
+            elif missing:
+                logger.error(f"Task {item.task.task_id} samples {missing} missing after {item.attempt + 1} attempts")
+            # Timed out and transiently failed samples are drawn again, fatal errors would fail again
+            errors = [
+                sample_id
+                for _, sample_id, response in item_results
+                if response is None and failures.get(sample_id) in (RETRYABLE, THROTTLE)
+            ]
+            if errors:
+                failed.append(WorkItem(item.task, errors, job=item.job))
+            for result in item_results:
+                await results.put((item.job, *result))
+
+    async def _continue_sample(self, task: Task, sample_id: str, response: dict | None) -> dict | None:
+        r"""Continue a sample cut at max_completion_tokens or by the timeout from its partial content.
+
+        Each continuation request prefills the content so far as the assistant message and gets the
+        full token budget again, the pieces are stitched into one sample recording the number of
+        requests under ``continuations``. A sample cut by the timeout that is still unfinished after
+        ``max_continuations`` requests counts as failed, to be drawn again in the retry passes.
+        """
+        hops = 0
+        while hops < self.config.max_continuations and self._unfinished(response):
+            content = response["choices"][0]["message"].get("content")
+            if not content:  # nothing to continue from, e.g. cut inside the reasoning
+                break
+            hops += 1
+            piece = await self._request_continuation(task, sample_id, content)
+            if piece is None:
+                break
+            response = {**self._stitch(response, piece), "continuations": hops}
+        if hops:
+            self.usage.continuations[hops] += 1
+        if response is not None and response["choices"][0].get("finish_reason") is None:
+            if (failures := FAILURES.get()) is not None:
+                failures.setdefault(sample_id, THROTTLE)
+            return None
+        return response
+
+    async def _uncap_sample(self, task: Task, sample_id: str, response: dict, budget: int) -> dict | None:
+        r"""Continue a sample cut at its per-task token cap with the ``budget`` left of max_completion_tokens.
+
+        The stitched sample ends where a single uncapped request would have. A sample whose
+        continuation fails counts as failed, to be drawn again in the retry passes.
+        """
+        piece = await self._request_continuation(task, sample_id, response["choices"][0]["message"]["content"], budget)
+        # a piece cut by the timeout is continued further by _continue_sample if continuation is enabled
+        if piece is None or (piece["choices"][0].get("finish_reason") is None and not self.config.max_continuations):
+            if (failures := FAILURES.get()) is not None:
+                failures.setdefault(sample_id, THROTTLE)
+            return None
+        return self._stitch(response, piece)
+
+    async def _request_continuation(
+        self, task: Task, sample_id: str, content: str, max_tokens: int | None = None
+    ) -> dict | None:
+        r"""Request the continuation of a sample from its content so far, the partial one if cut by the timeout.
+
+        ``max_tokens`` caps its max_completion_tokens, which is otherwise the full token budget.
+        """
+        messages = [*self._build_messages(task.prompt), {"role": "assistant", "content": content}]
+        partials: dict[int, dict] = {}
+        SAMPLE_IDS.set((sample_id,))
+        PARTIALS.set(partials)
+        TOKEN_CAP.set(max_tokens)
+        timeout = REQUEST_TIMEOUT.get() or self._sampling_params().timeout
+        request = self.complete(messages, affinity_key=self._affinity_key(task.task_id), continuation=True)
+        try:
+            return await asyncio.wait_for(request, timeout=timeout)
+        except TimeoutError:
+            self._endpoint().limiter.on_timeout()
+            return partials.get(0)
+        except Exception as e:
+            logger.error(f"Failed to continue task {task.task_id} sample {sample_id}: {str(e)}")
+            return None
+
+    @staticmethod
+    def _unfinished(response: dict | None) -> bool:
+        r"""Whether a sample was cut at max_completion_tokens or, without a finish reason, by the timeout."""
+        return response is not None and response["choices"][0].get("finish_reason") in ("length", None)
+
+    @staticmethod
+    def _stitch(response: dict, piece: dict) -> dict:
+        r"""Append a continuation to a sample, concatenating the content and reasoning and summing the usage.
+
+        Pieces without usage, e.g. cut by the timeout, are left out of the sum, which is then marked
+        with ``usage_partial``.
+        """
+        choice, message = response["choices"][0], response["choices"][0]["message"]
+        continued = piece["choices"][0]["message"]
+        message = {**message, "content": message["content"] + (continued.get("content") or "")}
+        for key in REASONING_FIELDS:
+            if continued.get(key):
+                message[key] = (message.get(key) or "") + continued[key]
+        usages = [usage for usage in (response.get("usage"), piece.get("usage")) if usage]
+        usage = {key: sum(usage.get(key) or 0 for usage in usages) for key in USAGE_FIELDS} if usages else None
+        stitched = {
+            **response,
+            "choices": [{**choice, "message": message, "finish_reason": piece["choices"][0].get("finish_reason")}],
+            "usage": usage,
+        }
+        if usage is not None and len(usages) < 2:
+            stitched["usage_partial"] = True
+        return stitched
+
+    async def _retry_failed(self, failed: list[WorkItem], results: asyncio.Queue) -> None:
+        r"""Retry failed and timed-out samples in up to ``retry_passes`` final passes.
+
+        Each pass runs with a quarter of the workers of the previous one and twice its timeout, so
+        that stragglers get the backend capacity and time they need.
+        """
+        num_workers = self.num_workers
+        timeout = self.config.sampling_params.timeout
+        for attempt in range(1, self.config.retry_passes + 1):
+            if not failed:
+                return
+            items, failed[:] = list(failed), []
+            num_workers = max(num_workers // 4, 1)
+            timeout *= 2
+            num_samples = sum(len(item.sample_ids) for item in items)
+            logger.info(
+                f"Retry pass {attempt}: {num_samples} failed samples, {num_workers} workers, timeout {timeout}s"
+            )
+            REQUEST_TIMEOUT.set(timeout)
+            work = WorkQueue(iter(items))
+            await asyncio.gather(*(self._worker(work, results, failed) for _ in range(min(num_workers, len(items)))))
+        if failed:
+            num_samples = sum(len(item.sample_ids) for item in failed)
+            logger.warning(f"{num_samples} samples still failed after {self.config.retry_passes} retry passes")
+
+    async def _prepare_job(self, job: Job) -> None:
+        r"""Open the output files of a job and count the samples still to generate per task."""
+        dataset = job.dataset
         await dataset.init_files()
+        if self.config.early_stop:
+            job.stop_condition = dataset.stop_reason
+        if self.lengths is not None:
+            self._load_lengths(job)
+        if self.config.adaptive_sampling:
+            if hasattr(dataset, "check_correct") and dataset.groundtruth:
+                job.stopping = AdaptiveStopping(
+                    self.config.adaptive_min_samples, self.config.adaptive_tolerance, max_k=self.config.n_samples
+                )
+            else:
+                logger.warning(f"{dataset.name} cannot be graded during generation, adaptive sampling is disabled")
 
-        task_ids, tasks_list = list(dataset.tasks.keys()), list(dataset.tasks.values())
-        completed_tasks: set[str] = set()  # Track completed tasks
+        manifest = build_manifest(
+            job.sampling_params or self.config.sampling_params, job.system_prompt, dataset.meta_data, dataset.config
+        )
+        if dataset.config.seed_from is not None:
+            await self._seed_job(job, manifest)
+        path = manifest_path(dataset.config.output_dir, dataset.name)
+        # A resumed run must draw its samples like the run it continues, whose manifest is kept
+        if self.config.resume and (previous := load_manifest(path)) is not None:
+            mismatches = manifest_mismatches(previous, manifest)
+            assert not mismatches, (
+                f"Settings of {dataset.name} differ from the run being resumed in {dataset.config.output_dir}: "
+                f"{'; '.join(mismatches)}"
+            )
+        else:
+            write_manifest(path, manifest)
 
-        if self.config.resume:
-            results = self.load_results(dataset, self.config.output_dir)
-            resume_tasks = defaultdict(int)
-            for task_id in task_ids:
-                exist = len(results[task_id]) if task_id in results else 0
-                resume_tasks[task_id] = max(self.config.n_samples - exist, 0)
+        task_ids = list(dataset.tasks.keys())
+        if self.config.resume or dataset.config.seed_from is not None:
+            # Counted from the sidecar index of the raw file by init_files, without loading the responses
+            job.pending = {task_id: max(self.config.n_samples - dataset.num_saved[task_id], 0) for task_id in task_ids}
+            job.num_saved = dict(dataset.num_saved)
+            if self.config.resume:
+                logger.info(f"{dataset.name}: resuming from {sum(dataset.num_saved.values())} saved samples")
         else:
-            resume_tasks = dict.fromkeys(task_ids, self.config.n_samples)
+            job.pending = dict.fromkeys(task_ids, self.config.n_samples)
 
-        results: dict[str, list[dict[str, str]]] = defaultdict(list)
-        coroutines = [
-            self._generate_single_sample(task.task_id, str(sample_id), task.prompt, task.metadata)
-            for task in tasks_list
-            for sample_id in range(resume_tasks[task.task_id])
-        ]
-        random.shuffle(coroutines)
-        total_tasks = sum(1 if resume_tasks[task_id] > 0 else 0 for task_id in task_ids)
-        total_samples = sum(resume_tasks.values())
-
-        optimal_workers = min(len(coroutines), self.config.num_workers)
-        semaphore = asyncio.Semaphore(optimal_workers)
-
-        async def bounded_task(coro):
-            r"""Execute with semaphore and timeout protection."""
-            async with semaphore:
-                try:
-                    return await asyncio.wait_for(coro, timeout=self.config.sampling_params.timeout)
-                except TimeoutError:
-                    logger.warning(f"Task timed out after {self.config.sampling_params.timeout}s")
-                    return (None, None, None)
+    async def _seed_job(self, job: Job, manifest: dict) -> None:
+        r"""Import the samples of the previous run in ``--seed-from``, which must have the same settings.
+
+        Samples are only imported into an empty output, so that resuming a seeded run does not
+        import them twice.
+        """
+        dataset = job.dataset
+        source = dataset.config.seed_from
+        previous = load_manifest(manifest_path(source, dataset.name))
+        assert previous is not None, f"No manifest of {dataset.name} in {source}, cannot check its settings"
+        mismatches = manifest_mismatches(previous, manifest)
+        assert not mismatches, f"Settings of {dataset.name} differ from the run in {source}: {'; '.join(mismatches)}"
+        if dataset.num_saved:
+            logger.info(f"{dataset.name}: {dataset.config.output_dir} already has samples, not importing {source}")
+            return
+        raw = next((path for fmt in RAW_FORMATS if (path := raw_path(source, dataset.name, fmt)).exists()), None)
+        assert raw is not None, f"No raw samples of {dataset.name} in {source}"
+        num_imported = await dataset.import_samples(raw, self.config.n_samples)
+        logger.info(f"{dataset.name}: imported {num_imported} samples from {raw}")
+
+    async def agenerate_jobs(self, jobs: list[Job]) -> None:
+        r"""Generate responses for several datasets asynchronously with one shared pool of workers."""
+        extractor = None
+        if self.config.extract_workers > 0:
+            extractor = ExtractionPool([job.dataset for job in jobs], self.config.extract_workers)
+        for job in jobs:
+            job.dataset.extractor = extractor
+            await self._prepare_job(job)
+        total_tasks = sum(job.total_tasks for job in jobs)
+        total_samples = sum(sum(job.pending.values()) for job in jobs)
+
+        # Workers share one lazy iterator; the bounded queue applies backpressure if saving falls behind
+        work = WorkQueue(iter_job_work_items(jobs, self.config.schedule, self.samples_per_request))
+        optimal_workers = min(-(-total_samples // self.samples_per_request), self.num_workers)
+        results_queue: asyncio.Queue = asyncio.Queue(maxsize=max(optimal_workers, 1))
+
+        failed: list[WorkItem] = []
+
+        async def run_workers() -> None:
+            try:
+                await asyncio.gather(*(self._worker(work, results_queue, failed) for _ in range(optimal_workers)))
+                await self._retry_failed(failed, results_queue)
+            finally:
+                await results_queue.put(None)
+
+        server = None
+        if self.config.metrics_port:
+            server = await self.telemetry.serve(self.config.metrics_port, self.config.metrics_host)
+        exporter = None
+        if self.config.metrics_file:
+            exporter = asyncio.create_task(self.telemetry.export(self.config.metrics_file))
+
+        grading: set[asyncio.Task] = set()
 
         with ProgressTracker(total_samples, total_tasks) as tracker:
-            tasks = [bounded_task(coro) for coro in coroutines]
-
-            for future in asyncio.as_completed(tasks):
-                task_id, sample_id, response = await future
-
-                if task_id is not None and response is not None:  # Skip timed out tasks
-                    tracker.update_sample_progress()
-                    results[task_id].append(response)
-                    await dataset.save_single_task(task_id, results[task_id])
-                    results[task_id].clear()
-                    resume_tasks[task_id] -= 1
-                    if task_id not in completed_tasks and resume_tasks[task_id] == 0:
-                        completed_tasks.add(task_id)
-                        results.pop(task_id)
-                        tracker.update_task_progress()
-
-        # Save remaining results
-        if len(completed_tasks) < total_tasks:
-            logger.warning(f"Only {len(completed_tasks)} tasks completed out of {total_tasks}")
-            for task_id, responses in results.items():
-                await dataset.save_single_task(task_id, responses)
+            producer = asyncio.create_task(run_workers())
+
+            while (result := await results_queue.get()) is not None:
+                job, task_id, sample_id, response = result
+                self.telemetry.inc("samples_total", status="completed" if response is not None else "failed")
+
+                if response is not None:  # Skip failed and timed out samples
+                    job.lengths.update(task_id, response)
+                    extraction = await job.dataset.save_single_task(task_id, [response])
+                    if job.pending[task_id] > 0:  # samples in flight when adaptive sampling stopped the task
+                        tracker.update_sample_progress()
+                        job.pending[task_id] -= 1
+                    if job.stopping is not None:
+                        grade = asyncio.create_task(self._grade(job, task_id, extraction, tracker))
+                        grading.add(grade)
+                        grade.add_done_callback(grading.discard)
+                    self._check_completed(job, task_id, tracker)
+
+            await producer
+            await asyncio.gather(*grading)
+
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+        if exporter is not None:
+            exporter.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await exporter
+        for endpoint in self.endpoints.values():
+            endpoint.limiter.report()
+            endpoint.rate_limiter.report()
+            endpoint.balancer.report()
+        if self.hedge is not None:
+            self.hedge.report()
+        self.usage.report()
+        self.timing.report()
+        if self.cache is not None:
+            self.cache.report()
+            self.cache.close()
+        for job in jobs:
+            job.lengths.report(job.dataset.name)
+            if self.lengths is not None:
+                self.lengths.save(self._model_family(job), job.dataset.name, job.lengths)
+        await self.client.close()
+        for job in jobs:
+            name = job.dataset.name
+            if len(job.completed_tasks) < job.total_tasks:
+                logger.warning(f"{name}: only {len(job.completed_tasks)} tasks completed out of {job.total_tasks}")
+            else:
+                logger.info(f"{name}: all tasks completed, saved to {job.dataset.config.output_dir}")
+            await job.dataset.close_files()
+            job.dataset.extractor = None
+            if job.stopping is not None:
+                self._save_sample_counts(job)
+        if extractor is not None:
+            extractor.shutdown()
+
+    def _load_lengths(self, job: Job) -> None:
+        r"""Set the expected lengths and token caps of a job's tasks from the lengths recorded in earlier runs."""
+        history = self.lengths.load(self._model_family(job), job.dataset.name)
+        job.expected_lengths = {task_id: expected_length(lengths) for task_id, lengths in history.items() if lengths}
+        if self.config.length_cap_headroom > 0:
+            max_tokens = (job.sampling_params or self.config.sampling_params).max_completion_tokens
+            for task_id, lengths in history.items():
+                if (cap := token_cap(lengths, self.config.length_cap_headroom, max_tokens)) is not None:
+                    job.token_caps[task_id] = cap
+        logger.info(
+            f"{job.dataset.name}: recorded completion lengths of {self._model_family(job)} for "
+            f"{len(job.expected_lengths)} tasks, {len(job.token_caps)} tasks capped below max_completion_tokens"
+        )
+
+    def _model_family(self, job: Job) -> str:
+        return model_family((job.sampling_params or self.config.sampling_params).model)
+
+    @staticmethod
+    def _check_completed(job: Job, task_id: str, tracker: ProgressTracker) -> None:
+        if task_id not in job.completed_tasks and job.pending[task_id] == 0:
+            job.completed_tasks.add(task_id)
+            tracker.update_task_progress()
+
+    async def _grade(self, job: Job, task_id: str, extraction: asyncio.Task, tracker: ProgressTracker) -> None:
+        r"""Grade a sample for adaptive sampling once its solution is extracted, stopping its task if settled.
+
+        Samples are graded in the extraction pool, or inline without one.
+        """
+        dataset = job.dataset
+        solution = (await extraction)[0]
+        ground_truth = dataset.groundtruth[task_id].answer
+        if dataset.extractor is not None:
+            correct = await dataset.extractor.check_correct(dataset.name, task_id, solution, ground_truth)
         else:
-            logger.info(f"All tasks completed, saved to {self.config.output_dir}")
+            correct = dataset.check_correct(solution, ground_truth, task_id)
+        if job.stopping.update(task_id, solution, bool(correct)):
+            # The remaining samples of the task are skipped, count them as done
+            tracker.update_sample_progress(job.pending[task_id])
+            job.pending[task_id] = 0
+            self._check_completed(job, task_id, tracker)
 
-        await dataset.close_files()
+    @staticmethod
+    def _save_sample_counts(job: Job) -> None:
+        r"""Record how many samples adaptive sampling drew per task, so that metrics can account for it."""
+        summary = job.stopping.summary()
+        path = job.dataset.config.output_dir / f"{job.dataset.name}_samples.json"
+        with open(path, "wb") as f:
+            f.write(orjson.dumps(summary, option=orjson.OPT_INDENT_2))
+        num_stopped = sum(counts["stopped_early"] for counts in summary.values())
+        num_samples = sum(counts["num_samples"] for counts in summary.values())
+        logger.info(
+            f"{job.dataset.name}: adaptive sampling stopped {num_stopped} of {len(summary)} tasks early, "
+            f"drew {num_samples} samples, counts saved to {path}"
+        )
+
+    async def agenerate(self, dataset: Dataset) -> None:
+        r"""Generate responses for a single dataset asynchronously."""
+        await self.agenerate_jobs([Job(dataset, self.system_prompt)])
 
     def generate(self, dataset: Dataset) -> None:
         r"""Synchronous API."""
         return asyncio.run(self.agenerate(dataset))
 
+    def generate_jobs(self, jobs: list[Job]) -> None:
+        r"""Synchronous API for several datasets sharing one worker pool."""
+        return asyncio.run(self.agenerate_jobs(jobs))
+
     def load_results(self, dataset: Dataset, output_dir: Path) -> dict[str, list[dict[str, str]]]:
         r"""Load results from a file."""
         output_dir = Path(output_dir)
         output_dir.mkdir(exist_ok=True, parents=True)
-        raw_path = output_dir / f"{dataset.name}_raw.jsonl"
         results = defaultdict(list)
-        with open(raw_path, "rb") as f:
-            for line in f:
-                data = orjson.loads(line)
-                results[data["task_id"]].append(data["response"])
+        for _, _, line in iter_raw(raw_path(output_dir, dataset.name, self.config.raw_format)):
+            data = orjson.loads(line)
+            results[data["task_id"]].append(data["response"])
         logger.info(f"Loaded {sum(len(res) for res in results.values())} responses")
         return results
@@ -0,0 +1,130 @@
+import asyncio
+import contextvars
+import statistics
+import time
+from collections import deque
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
+
+from evalhub.utils.logger import logger
+
+# Backends serving the requests of the current primary, recorded by the generator for its hedge to avoid
+SERVING_BACKENDS: contextvars.ContextVar[set[str | None] | None] = contextvars.ContextVar(
+    "serving_backends", default=None
+)
+# Set inside hedge requests to the backends serving the primary, so that they skip backend affinity and avoid them
+HEDGED: contextvars.ContextVar[frozenset[str | None] | None] = contextvars.ContextVar("hedged", default=None)
+
+T = TypeVar("T")
+
+
+class HedgePolicy:
+    r"""Duplicate straggling requests and keep whichever copy finishes first.
+
+    A request is hedged once its age exceeds the ``percentile`` of recent sample latencies, or the
+    ``tail_percentile`` once all work has been dispatched and only stragglers are left. Each
+    request is hedged at most once, and no hedging happens before ``min_samples`` latencies have
+    been observed: until then, requests wait for their completion or for the window to fill.
+    """
+
+    def __init__(
+        self,
+        percentile: float = 95.0,
+        tail_percentile: float = 50.0,
+        min_samples: int = 20,
+        window: int = 1000,
+        poll_interval: float = 1.0,
+    ) -> None:
+        self.percentile = percentile
+        self.tail_percentile = tail_percentile
+        self.min_samples = min_samples
+        self.poll_interval = poll_interval
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.num_hedged = 0
+        self.num_hedge_wins = 0
+        # Set once min_samples latencies are observed, created per event loop as each generation runs its own
+        self._filled: asyncio.Event | None = None
+        self._filled_loop: asyncio.AbstractEventLoop | None = None
+
+    def _window_filled(self) -> asyncio.Event:
+        r"""Event of the running loop set once ``min_samples`` latencies are observed."""
+        loop = asyncio.get_running_loop()
+        if self._filled is None or self._filled_loop is not loop:
+            self._filled, self._filled_loop = asyncio.Event(), loop
+            if len(self.latencies) >= self.min_samples:
+                self._filled.set()
+        return self._filled
+
+    def _observe(self, latency: float) -> None:
+        self.latencies.append(latency)
+        if len(self.latencies) >= self.min_samples and self._filled is not None:
+            self._filled.set()
+
+    def delay(self, tail: bool) -> float | None:
+        r"""Age after which a request is hedged, None while there are too few observations."""
+        if len(self.latencies) < self.min_samples:
+            return None
+        percentile = self.tail_percentile if tail else self.percentile
+        quantiles = statistics.quantiles(self.latencies, n=100, method="inclusive")
+        return quantiles[min(max(round(percentile) - 1, 0), 98)]
+
+    async def run(
+        self,
+        request: Callable[[], Awaitable[T]],
+        is_tail: Callable[[], bool],
+        succeeded: Callable[[T], bool] = lambda _: True,
+    ) -> T:
+        r"""Run ``request``, hedging it with a second copy on another backend if it straggles."""
+        start = time.monotonic()
+        backends: set[str | None] = set()
+        token = SERVING_BACKENDS.set(backends)
+        try:
+            primary = asyncio.create_task(request())
+        finally:
+            SERVING_BACKENDS.reset(token)
+        tasks = {primary}
+        try:
+            while True:
+                delay = self.delay(is_tail())
+                age = time.monotonic() - start
+                if delay is not None and age >= delay:
+                    break
+                if delay is None:
+                    filled = asyncio.create_task(self._window_filled().wait())
+                    try:
+                        done, _ = await asyncio.wait({primary, filled}, return_when=asyncio.FIRST_COMPLETED)
+                    finally:
+                        filled.cancel()
+                else:
+                    # Wake up now and then to pick up the tail percentile once all work is dispatched
+                    done, _ = await asyncio.wait(tasks, timeout=min(delay - age, self.poll_interval))
+                if primary in done:
+                    self._observe(time.monotonic() - start)
+                    return primary.result()
+
+            self.num_hedged += 1
+            token = HEDGED.set(frozenset(backends))
+            try:
+                hedge = asyncio.create_task(request())
+            finally:
+                HEDGED.reset(token)
+            tasks.add(hedge)
+            while True:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                winner = next(iter(done))
+                # A failed copy only wins if the other copy has already finished too
+                if succeeded(winner.result()) or not tasks:
+                    break
+            if winner is hedge:
+                self.num_hedge_wins += 1
+            self._observe(time.monotonic() - start)
+            return winner.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    def report(self) -> None:
+        r"""Log how many requests were hedged and how many hedges won."""
+        if self.num_hedged:
+            logger.info(f"Hedged {self.num_hedged} requests, {self.num_hedge_wins} hedges finished first")
@@ -0,0 +1,134 @@
+import math
+import re
+import sqlite3
+import statistics
+from collections import Counter, defaultdict, deque
+from pathlib import Path
+
+import orjson
+
+from evalhub.utils.logger import logger
+
+# Recent completion lengths kept per task, and how many are needed before they set a token cap
+MAX_RECORDED = 64
+MIN_OBSERVATIONS = 8
+CHECKPOINT_PATTERN = re.compile(r"(checkpoint|global_step|step|iter)[-_]?\d+", re.IGNORECASE)
+
+
+def model_family(model: str) -> str:
+    r"""Key of a model in the length database: its name without provider prefix, directory or checkpoint step."""
+    parts = [part for part in model.rstrip("/").split("/") if part]
+    while len(parts) > 1 and CHECKPOINT_PATTERN.fullmatch(parts[-1]):
+        parts.pop()
+    return parts[-1].lower() if parts else model.lower()
+
+
+def completion_tokens(response: dict) -> int | None:
+    r"""Completion tokens of one sample, its share of the usage of a request with several choices."""
+    # early-stopped streams may end without usage
+    return (response.get("usage") or {}).get("completion_tokens") or None
+
+
+class LengthRecorder:
+    r"""Completion lengths and truncations of one run of a dataset."""
+
+    def __init__(self) -> None:
+        self.lengths: dict[str, list[int]] = defaultdict(list)
+        self.num_samples: Counter[str] = Counter()
+        self.num_truncated: Counter[str] = Counter()
+        self.num_uncapped = 0  # samples cut short by a per-task cap and continued
+        self.num_redrawn = 0  # samples cut short by a per-task cap inside the reasoning and drawn again
+
+    def update(self, task_id: str, response: dict) -> None:
+        choice = (response.get("choices") or [{}])[0]
+        self.num_samples[task_id] += 1
+        if choice.get("finish_reason") == "length":
+            self.num_truncated[task_id] += 1
+        if (tokens := completion_tokens(response)) is not None:
+            self.lengths[task_id].append(tokens)
+
+    def report(self, name: str) -> None:
+        r"""Log how many samples stopped at the token limit, which should be none of them."""
+        total = sum(self.num_samples.values())
+        truncated = sum(self.num_truncated.values())
+        if total == 0:
+            return
+        message = f"{name}: {truncated} of {total} samples ({truncated / total:.2%}) stopped at max_completion_tokens"
+        if self.num_uncapped:
+            message += f", {self.num_uncapped} samples exceeded their per-task cap and were continued"
+        if self.num_redrawn:
+            message += f", {self.num_redrawn} samples exceeded their per-task cap in the reasoning and were drawn again"
+        if truncated:
+            logger.warning(message)
+        else:
+            logger.info(message)
+
+
+class LengthDatabase:
+    r"""Per-task completion-length statistics across runs, keyed by model family and dataset.
+
+    Stored in a SQLite database next to the dataset caches. Each task keeps its ``MAX_RECORDED``
+    most recent completion lengths, from which the generator derives the expected length used by
+    the ``longest`` schedule and the per-task token caps.
+    """
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(path)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS lengths (family TEXT NOT NULL, dataset TEXT NOT NULL, task_id TEXT NOT NULL, "
+            "lengths BLOB NOT NULL, num_samples INTEGER NOT NULL, num_truncated INTEGER NOT NULL, "
+            "PRIMARY KEY (family, dataset, task_id))"
+        )
+        self.db.commit()
+
+    def load(self, family: str, dataset: str) -> dict[str, list[int]]:
+        r"""Recorded completion lengths per task."""
+        rows = self.db.execute(
+            "SELECT task_id, lengths FROM lengths WHERE family = ? AND dataset = ?", (family, dataset)
+        ).fetchall()
+        return {task_id: orjson.loads(lengths) for task_id, lengths in rows}
+
+    def save(self, family: str, dataset: str, recorder: LengthRecorder) -> None:
+        r"""Merge the lengths of a run into the database."""
+        previous = {
+            task_id: (lengths, num_samples, num_truncated)
+            for task_id, lengths, num_samples, num_truncated in self.db.execute(
+                "SELECT task_id, lengths, num_samples, num_truncated FROM lengths WHERE family = ? AND dataset = ?",
+                (family, dataset),
+            )
+        }
+        rows = []
+        for task_id, num_samples in recorder.num_samples.items():
+            lengths, total, truncated = previous.get(task_id, (b"[]", 0, 0))
+            recent = deque(orjson.loads(lengths), maxlen=MAX_RECORDED)
+            recent.extend(recorder.lengths[task_id])
+            rows.append(
+                (
+                    family,
+                    dataset,
+                    task_id,
+                    orjson.dumps(list(recent)),
+                    total + num_samples,
+                    truncated + recorder.num_truncated[task_id],
+                )
+            )
+        self.db.executemany("INSERT OR REPLACE INTO lengths VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.db.commit()
+
+    def close(self) -> None:
+        self.db.close()
+
+
+def expected_length(lengths: list[int]) -> float:
+    r"""Expected completion length of a task, used to dispatch the longest tasks first."""
+    return statistics.mean(lengths)
+
+
+def token_cap(lengths: list[int], headroom: float, max_tokens: int) -> int | None:
+    r"""Per-task token cap: the 95th percentile of the recorded lengths times ``headroom``, if below ``max_tokens``."""
+    if len(lengths) < MIN_OBSERVATIONS:
+        return None
+    p95 = statistics.quantiles(lengths, n=20, method="inclusive")[-1]
+    cap = math.ceil(p95 * headroom)
+    return cap if cap < max_tokens else None
@@ -0,0 +1,58 @@
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any
+
+import orjson
+
+from evalhub.inference.schemas import GenerationConfig, SamplingParams
+
+# Sampling parameters that do not change the samples drawn
+UNCHECKED_PARAMS = ("timeout",)
+# Generation settings that change the samples drawn, e.g. cut short by early stopping or stitched from continuations
+GENERATION_SETTINGS = ("early_stop", "length_cap_headroom", "max_continuations")
+# Manifest entries compared setting by setting
+NESTED_KEYS = ("sampling_params", "generation")
+
+
+def manifest_path(output_dir: Path, name: str) -> Path:
+    r"""Manifest of the settings a dataset was generated with, ``{name}_manifest.json``."""
+    return output_dir / f"{name}_manifest.json"
+
+
+def build_manifest(
+    params: SamplingParams,
+    system_prompt: str | None,
+    meta_data: dict[str, Any],
+    config: GenerationConfig | None = None,
+) -> dict:
+    r"""Settings that determine the samples of a dataset: sampling and generation settings, prompt and dataset."""
+    sampling_params = {key: value for key, value in asdict(params).items() if key not in UNCHECKED_PARAMS}
+    generation = {key: getattr(config, key) for key in GENERATION_SETTINGS} if config is not None else {}
+    return {
+        "sampling_params": sampling_params,
+        "generation": generation,
+        "system_prompt": system_prompt,
+        "meta_data": meta_data,
+    }
+
+
+def load_manifest(path: Path) -> dict | None:
+    return orjson.loads(path.read_bytes()) if path.exists() else None
+
+
+def write_manifest(path: Path, manifest: dict) -> None:
+    path.write_bytes(orjson.dumps(manifest, option=orjson.OPT_INDENT_2))
+
+
+def manifest_mismatches(previous: dict, current: dict) -> list[str]:
+    r"""Settings that differ between two manifests, as ``key: previous != current``."""
+    # Compare as stored, e.g. tuples as lists
+    previous, current = orjson.loads(orjson.dumps(previous)), orjson.loads(orjson.dumps(current))
+    mismatches = []
+    for key, value in current.items():
+        if key in NESTED_KEYS:
+            old = previous.get(key) or {}
+            mismatches += [f"{name}: {old.get(name)!r} != {v!r}" for name, v in value.items() if old.get(name) != v]
+        elif previous.get(key) != value:
+            mismatches.append(f"{key}: {previous.get(key)!r} != {value!r}")
+    return mismatches
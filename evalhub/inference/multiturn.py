@@ -14,6 +14,7 @@ from evalhub.callback.base_callback import BaseCallback
 from evalhub.inference.generator import LLMGenerator
 from evalhub.inference.schemas import GenerationConfig
 from evalhub.tools.base_tool import BaseTool
+from evalhub.utils.logger import logger
 
 
 def get_module(module_name: str) -> ModuleType:
@@ -30,6 +31,13 @@ def get_module(module_name: str) -> ModuleType:
 class MultiTurnGenerator(LLMGenerator):
     def __init__(self, config: GenerationConfig, system_prompt: str | None = None) -> None:
         super().__init__(config, system_prompt)
+        if self.samples_per_request > 1:
+            logger.warning("Multi-turn generation does not support --samples-per-request, using 1")
+            self.samples_per_request = 1
+        if self.hedge is not None:
+            # A duplicate conversation would run its tool calls twice on the same tool instances
+            logger.warning("Multi-turn generation does not support --hedge-percentile, disabling hedging")
+            self.hedge = None
         self._initialize_tools(config.tool_config)
         self._initialize_callback(config.callback)
 
@@ -66,9 +74,11 @@ class MultiTurnGenerator(LLMGenerator):
         callback_cls = getattr(module, class_name)
         self.callback: BaseCallback = callback_cls()
 
-    async def get_response_with_retry(self, messages: list[dict], max_retries: int = 3) -> ChatCompletion | None:
+    async def get_response_with_retry(
+        self, messages: list[dict], max_retries: int = 3, affinity_key: str | None = None
+    ) -> ChatCompletion | None:
         for _ in range(max_retries):
-            response = await self.complete(messages, tools=self.tool_schemas)
+            response = await self.complete(messages, tools=self.tool_schemas, affinity_key=affinity_key)
             if response is not None:
                 return response
         return None
@@ -141,7 +151,7 @@ class MultiTurnGenerator(LLMGenerator):
         # multi-turn generation
         messages = self._build_messages(prompt)
         for _ in range(self.config.max_turns):
-            response = await self.get_response_with_retry(messages)
+            response = await self.get_response_with_retry(messages, affinity_key=self._affinity_key(task_id))
             if response is None:
                 break
 
@@ -0,0 +1,109 @@
+import asyncio
+import time
+
+import orjson
+
+from evalhub.utils.logger import logger
+
+# Rough number of characters per token, used to estimate prompt tokens without a tokenizer
+CHARS_PER_TOKEN = 4
+
+
+def estimate_prompt_tokens(params: dict) -> int:
+    r"""Estimate of the prompt tokens of a request, from the length of its messages and tool schemas."""
+    prompt = orjson.dumps(params.get("messages") or []) + orjson.dumps(params.get("tools") or [])
+    return len(prompt) // CHARS_PER_TOKEN
+
+
+def estimate_tokens(params: dict) -> int:
+    r"""Upper estimate of the tokens a request consumes: its prompt plus the maximum completion."""
+    completion = (params.get("max_completion_tokens") or 0) * (params.get("n") or 1)
+    return estimate_prompt_tokens(params) + completion
+
+
+class TokenBucket:
+    r"""Token bucket refilled continuously at ``rate_per_minute``.
+
+    The capacity is ``burst`` seconds of refill, so requests are paced evenly rather than sent in
+    bursts. Costs above the capacity wait for a full bucket and leave it in debt, which delays the
+    following requests instead.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: float = 1.0) -> None:
+        self.rate = rate_per_minute / 60
+        self.capacity = max(self.rate * burst, 1.0)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, cost: float) -> float:
+        r"""Seconds until ``cost`` can be taken."""
+        self._refill()
+        return max(min(cost, self.capacity) - self.level, 0.0) / self.rate
+
+    def take(self, cost: float) -> None:
+        self._refill()
+        self.level -= cost
+
+    def refund(self, amount: float) -> None:
+        r"""Return tokens to the bucket, a negative amount charges more."""
+        self._refill()
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    r"""Pace requests under a requests-per-minute and a tokens-per-minute budget.
+
+    Requests are charged their estimated tokens up front, and the estimate is corrected with the
+    usage reported by the server once the response arrives, or with the tokens counted by the
+    client if the request fails or is cut short without usage.
+    Waiters are served in FIFO order. A limit of 0 disables the corresponding bucket.
+    """
+
+    def __init__(self, rpm: int = 0, tpm: int = 0) -> None:
+        self.buckets: dict[str, TokenBucket] = {}
+        if rpm > 0:
+            self.buckets["requests"] = TokenBucket(rpm)
+        if tpm > 0:
+            self.buckets["tokens"] = TokenBucket(tpm)
+        self._lock = asyncio.Lock()
+        self.num_delayed = 0
+        self.total_delay = 0.0
+
+    async def acquire(self, tokens: int) -> None:
+        r"""Wait until a request estimated at ``tokens`` fits in both budgets, then charge it."""
+        if not self.buckets:
+            return
+        costs = {"requests": 1, "tokens": tokens}
+        async with self._lock:
+            start = time.monotonic()
+            delayed = False
+            while (delay := max(bucket.delay(costs[name]) for name, bucket in self.buckets.items())) > 0:
+                delayed = True
+                await asyncio.sleep(delay)
+            for name, bucket in self.buckets.items():
+                bucket.take(costs[name])
+            if delayed:
+                self.num_delayed += 1
+                self.total_delay += time.monotonic() - start
+
+    def settle(self, estimate: int, actual: int | None, consumed: int = 0) -> None:
+        r"""Correct the charged token estimate with the actual usage, or else with the ``consumed`` tokens.
+
+        ``consumed`` counts the tokens of a request that reported no usage, e.g. its prompt and the
+        tokens streamed before it failed, timed out or stopped early.
+        """
+        if "tokens" in self.buckets:
+            self.buckets["tokens"].refund(estimate - (actual if actual is not None else consumed))
+
+    def report(self) -> None:
+        r"""Log how much the rate limits delayed requests."""
+        if self.num_delayed:
+            logger.info(
+                f"Rate limits delayed {self.num_delayed} requests, "
+                f"{self.total_delay / self.num_delayed:.2f}s on average"
+            )
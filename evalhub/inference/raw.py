@@ -0,0 +1,87 @@
+from collections.abc import Callable, Iterator
+from pathlib import Path
+
+ZSTD_LEVEL = 3
+READ_CHUNK = 1 << 20
+
+# Fields of a response kept by the slim zstd raw format
+SLIM_MESSAGE_FIELDS = ("role", "content", "reasoning_content", "reasoning", "tool_calls")
+SLIM_RESPONSE_FIELDS = ("usage", "timing", "num_choices", "continuations", "messages", "content", "reward")
+
+
+def _import_zstd():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("The zstd raw format requires zstandard, install it with `pip install zstandard`") from e
+    return zstandard
+
+
+def raw_path(output_dir: Path, name: str, raw_format: str) -> Path:
+    r"""Path of the raw responses of a dataset in the given format."""
+    return output_dir / (f"{name}_raw.jsonl.zst" if raw_format == "zstd" else f"{name}_raw.jsonl")
+
+
+def index_path(raw_path: Path) -> Path:
+    r"""Sidecar index of a raw file, ``{name}_raw.index`` or ``{name}_raw.zst.index``."""
+    return raw_path.with_name(raw_path.name.replace(".jsonl", "") + ".index")
+
+
+def slim_response(response: dict) -> dict:
+    r"""Project a response on the fields evalhub uses: content, reasoning, finish reason, usage and tool calls."""
+    choices = []
+    for choice in response.get("choices") or []:
+        message = choice.get("message") or {}
+        choices.append(
+            {
+                "index": choice.get("index", 0),
+                "finish_reason": choice.get("finish_reason"),
+                "message": {key: message[key] for key in SLIM_MESSAGE_FIELDS if message.get(key) is not None},
+            }
+        )
+    return {"choices": choices, **{key: response[key] for key in SLIM_RESPONSE_FIELDS if key in response}}
+
+
+def zstd_compressor() -> Callable[[bytes], bytes]:
+    r"""Compress a batch of records into one self-contained zstd frame."""
+    return _import_zstd().ZstdCompressor(level=ZSTD_LEVEL).compress
+
+
+def iter_raw(path: Path) -> Iterator[tuple[int, int, bytes]]:
+    r"""Stream the records of a raw file as ``(offset, length, line)`` without loading the file.
+
+    For JSONL, ``offset`` and ``length`` locate the line, for zstd the frame holding it. A torn
+    line or frame at the end of the file, e.g. after a crash, is not yielded.
+    """
+    if path.suffix == ".zst":
+        yield from _iter_zstd(path)
+        return
+    offset = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                return
+            yield offset, len(line), line
+            offset += len(line)
+
+
+def _iter_zstd(path: Path) -> Iterator[tuple[int, int, bytes]]:
+    zstandard = _import_zstd()
+    decompressor = zstandard.ZstdDecompressor().decompressobj()
+    frame: list[bytes] = []
+    offset = consumed = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(READ_CHUNK):
+            while chunk:
+                frame.append(decompressor.decompress(chunk))
+                if not decompressor.eof:
+                    consumed += len(chunk)
+                    break
+                rest = decompressor.unused_data
+                length = consumed + len(chunk) - len(rest)
+                for line in b"".join(frame).splitlines(keepends=True):
+                    yield offset, length, line
+                offset += length
+                frame, consumed = [], 0
+                decompressor = zstandard.ZstdDecompressor().decompressobj()
+                chunk = rest
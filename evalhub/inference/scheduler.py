@@ -0,0 +1,173 @@
+import contextvars
+import itertools
+import random
+from collections import deque
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass, field
+
+from evalhub.benchmarks.base import Dataset, Task
+from evalhub.inference.adaptive import AdaptiveStopping
+from evalhub.inference.lengths import LengthRecorder
+from evalhub.inference.schemas import SamplingParams
+
+MAX_REQUEUE_ATTEMPTS = 3
+
+
+@dataclass
+class Job:
+    r"""Generation state of one dataset, several jobs share the worker pool of a run."""
+
+    dataset: Dataset
+    system_prompt: str | None = None
+    sampling_params: SamplingParams | None = None  # overrides the generator's, for models and sweep variants
+    stop_condition: Callable[[str], str | None] | None = None
+    pending: dict[str, int] = field(default_factory=dict)  # samples still to generate per task
+    completed_tasks: set[str] = field(default_factory=set)
+    stopping: AdaptiveStopping | None = None
+    lengths: LengthRecorder = field(default_factory=LengthRecorder)
+    expected_lengths: dict[str, float] = field(default_factory=dict)  # from earlier runs, for the longest schedule
+    token_caps: dict[str, int] = field(default_factory=dict)  # per-task max_completion_tokens
+    # Samples saved by earlier runs per task, new sample ids start after them to miss their response cache entries
+    num_saved: dict[str, int] = field(default_factory=dict)
+
+    def is_stopped(self, task_id: str) -> bool:
+        r"""Whether adaptive sampling has stopped issuing samples for a task."""
+        return self.stopping is not None and task_id in self.stopping.stopped
+
+    @property
+    def total_tasks(self) -> int:
+        return sum(1 for n in self.pending.values() if n > 0) + len(self.completed_tasks)
+
+
+# Job of the work item a worker is processing, read by the prompt building and early stopping
+CURRENT_JOB: contextvars.ContextVar[Job | None] = contextvars.ContextVar("current_job", default=None)
+
+
+@dataclass
+class WorkItem:
+    r"""One request worth of work: a task and the samples to draw for it."""
+
+    task: Task
+    sample_ids: list[str]
+    attempt: int = 0
+    job: Job | None = None
+
+
+def chunk_sample_ids(num_samples: int, chunk_size: int) -> list[list[str]]:
+    r"""Split the sample ids of a task into chunks of at most ``chunk_size``."""
+    return [
+        [str(sample_id) for sample_id in range(start, min(start + chunk_size, num_samples))]
+        for start in range(0, num_samples, chunk_size)
+    ]
+
+
+def iter_work_items(
+    dataset: Dataset,
+    pending: dict[str, int],
+    schedule: str = "random",
+    chunk_size: int = 1,
+    expected_lengths: dict[str, float] | None = None,
+) -> Iterator[WorkItem]:
+    r"""Lazily yield work items in the given schedule order.
+
+    Only the shuffled list of task ids is materialized, so memory stays flat regardless of
+    ``n_samples``. The ``random`` schedule spreads the samples of each task across the run, the
+    ``prefix`` schedule keeps them together so that the server can reuse the prompt's KV cache.
+    The ``longest`` schedule also keeps them together, sending tasks in decreasing order of
+    ``expected_lengths`` and tasks without recorded lengths first, so that the longest
+    generations do not start last and form the tail of the run.
+    """
+    task_ids = [task_id for task_id, n in pending.items() if n > 0]
+    random.shuffle(task_ids)
+    if schedule == "longest":
+        expected_lengths = expected_lengths or {}
+        task_ids.sort(key=lambda task_id: expected_lengths.get(task_id, float("inf")), reverse=True)
+    if schedule in ("prefix", "longest"):
+        yield from iter_grouped_work_items(dataset, task_ids, pending, chunk_size)
+        return
+    chunk_id = 0
+    while task_ids:
+        for task_id in task_ids:
+            start = chunk_id * chunk_size
+            sample_ids = [str(sample_id) for sample_id in range(start, min(start + chunk_size, pending[task_id]))]
+            yield WorkItem(dataset.tasks[task_id], sample_ids)
+        chunk_id += 1
+        task_ids = [task_id for task_id in task_ids if pending[task_id] > chunk_id * chunk_size]
+
+
+def iter_grouped_work_items(
+    dataset: Dataset, task_ids: list[str], pending: dict[str, int], chunk_size: int = 1
+) -> Iterator[WorkItem]:
+    r"""Yield the samples of each task back to back.
+
+    The first chunk of a task is sent one task ahead of its siblings, so that its prefill has
+    started and populated the prefix cache by the time the remaining samples arrive.
+    """
+    previous = None
+    for task_id in [*task_ids, None]:
+        if task_id is not None:
+            yield WorkItem(dataset.tasks[task_id], chunk_sample_ids(pending[task_id], chunk_size)[0])
+        if previous is not None:
+            for sample_ids in chunk_sample_ids(pending[previous], chunk_size)[1:]:
+                yield WorkItem(dataset.tasks[previous], sample_ids)
+        previous = task_id
+
+
+def iter_job_work_items(jobs: list[Job], schedule: str = "random", chunk_size: int = 1) -> Iterator[WorkItem]:
+    r"""Yield the work items of several jobs back to back.
+
+    Workers move on to the next job while the tail of the previous one is still in flight, so the
+    backends stay saturated across dataset boundaries. Consecutive jobs of the same dataset (models
+    and sweep variants) are interleaved round-robin, so that they progress at the same rate.
+    """
+    for _, group in itertools.groupby(jobs, key=lambda job: job.dataset.name):
+        iterators = [iter_job_items(job, schedule, chunk_size) for job in group]
+        while iterators:
+            for iterator in list(iterators):
+                if (item := next(iterator, None)) is None:
+                    iterators.remove(iterator)
+                else:
+                    yield item
+
+
+def iter_job_items(job: Job, schedule: str = "random", chunk_size: int = 1) -> Iterator[WorkItem]:
+    r"""Yield the work items of a single job."""
+    for item in iter_work_items(job.dataset, dict(job.pending), schedule, chunk_size, job.expected_lengths):
+        item.job = job
+        if offset := job.num_saved.get(item.task.task_id):
+            item.sample_ids = [str(int(sample_id) + offset) for sample_id in item.sample_ids]
+        yield item
+
+
+class WorkQueue:
+    r"""Work items shared by all workers: re-queued items first, then the lazy schedule.
+
+    Workers iterate over the same queue; since ``__next__`` never awaits, no locking is needed.
+    """
+
+    def __init__(self, items: Iterator[WorkItem]) -> None:
+        self._items = items
+        self._requeued: deque[WorkItem] = deque()
+        self._drained = False
+
+    def requeue(self, item: WorkItem) -> None:
+        r"""Schedule an item again, ahead of not-yet-dispatched work."""
+        item.attempt += 1
+        self._requeued.append(item)
+
+    @property
+    def exhausted(self) -> bool:
+        r"""Whether every work item has been dispatched, i.e. only in-flight requests are left."""
+        return self._drained and not self._requeued
+
+    def __iter__(self) -> "WorkQueue":
+        return self
+
+    def __next__(self) -> WorkItem:
+        if self._requeued:
+            return self._requeued.popleft()
+        try:
+            return next(self._items)
+        except StopIteration:
+            self._drained = True
+            raise
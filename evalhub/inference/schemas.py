@@ -1,12 +1,37 @@
-from dataclasses import asdict, dataclass, field
+import hashlib
+import itertools
+import os
+from dataclasses import asdict, dataclass, field, replace
 from pathlib import Path
 
+SCHEDULES = ["random", "prefix", "longest"]
+CLIENT_TYPES = ["litellm", "http"]
+RAW_FORMATS = ["jsonl", "zstd"]
+SWEEP_PARAMS = ["temperature", "top_p", "max_completion_tokens", "frequency_penalty", "presence_penalty"]
+# Sweep values of the system prompt: no system prompt, or the dataset's default one
+SWEEP_SYSTEM_PROMPTS = {"none": "", "default": None}
+
 DEFAULT_CHAT_STOP_TOKENS = [
     "<|im_end|>",
     "<|endoftext|>",
 ]
 
 
+def model_dirname(model: str) -> str:
+    r"""Output subdirectory of a model in a multi-model run: the last component of its name or path."""
+    return model.rstrip("/").split("/")[-1]
+
+
+def sweep_dirname(values: dict[str, str]) -> str:
+    r"""Output subdirectory of a sweep combination, free-form system prompts are named by a short hash."""
+    parts = []
+    for key, value in values.items():
+        if key == "system_prompt" and value not in SWEEP_SYSTEM_PROMPTS:
+            value = hashlib.sha256(value.encode()).hexdigest()[:8]
+        parts.append(f"{key}={value}")
+    return "_".join(parts)
+
+
 @dataclass
 class GenerationResult:
     r"""Class for storing generation results."""
@@ -22,7 +47,8 @@ class SamplingParams:
     model: str = field(
         default=...,
         metadata={
-            "help": "Model name or path to use for generation",
+            "help": "Model name or path to use for generation, several comma-separated models are generated in one "
+            "run, each into its own subdirectory of --output-dir",
         },
     )
     temperature: float = field(
@@ -94,6 +120,22 @@ class GenerationConfig:
         },
     )
 
+    api_base: list[str] | None = field(
+        default=None,
+        metadata={
+            "help": "Base URLs of the servers (specify multiple --api-base or comma-separated), "
+            "requests are routed to the least-loaded one; with several models, 'model=url' serves a model "
+            "from its own servers and URLs without a model serve the others",
+        },
+    )
+
+    client: str = field(
+        default="litellm",
+        metadata={
+            "help": "API client: 'litellm' supports all providers, 'http' talks to OpenAI compatible servers directly",
+        },
+    )
+
     system_prompt: str = field(
         default="",
         metadata={
@@ -101,6 +143,15 @@ class GenerationConfig:
         },
     )
 
+    sweep: str | None = field(
+        default=None,
+        metadata={
+            "help": "Sweep sampling parameters, e.g. 'temperature=0.6,1.0;max_completion_tokens=4096,8192' runs "
+            "every combination through one worker pool, each in its own subdirectory of --output-dir; "
+            "'system_prompt=none,default' toggles the dataset's system prompt",
+        },
+    )
+
     enable_multiturn: bool = field(
         default=False,
         metadata={
@@ -115,6 +166,14 @@ class GenerationConfig:
         },
     )
 
+    seed_from: Path | None = field(
+        default=None,
+        metadata={
+            "help": "Output directory of a previous run with the same model, sampling parameters and system prompt, "
+            "its raw samples are imported and only the missing ones up to --n-samples are generated",
+        },
+    )
+
     # Generation parameters
     n_samples: int = field(
         default=1,
@@ -122,10 +181,156 @@ class GenerationConfig:
             "help": "Number of samples to generate per prompt",
         },
     )
+    adaptive_sampling: bool = field(
+        default=False,
+        metadata={
+            "help": "Grade samples as they land and stop sampling a task once its majority vote and pass@k are "
+            "settled, per-task sample counts are saved to {task}_samples.json",
+        },
+    )
+    adaptive_min_samples: int = field(
+        default=8,
+        metadata={
+            "help": "Minimum number of samples per task before --adaptive-sampling may stop it",
+        },
+    )
+    adaptive_tolerance: float = field(
+        default=0.05,
+        metadata={
+            "help": "Maximum posterior standard deviation of a task's pass@k, for every reported k, "
+            "for --adaptive-sampling to stop it",
+        },
+    )
+    samples_per_request: int = field(
+        default=1,
+        metadata={
+            "help": "Number of samples fetched per request with the `n` parameter, --num-workers then bounds the "
+            "requests in flight, i.e. up to --num-workers times this many sequences",
+        },
+    )
     num_workers: int = field(
         default=1024,
         metadata={
-            "help": "Number of parallel workers for generation",
+            "help": "Number of parallel workers for generation per model, each with one request in flight",
+        },
+    )
+    retry_passes: int = field(
+        default=2,
+        metadata={
+            "help": "Final passes retrying failed and timed-out samples, each with a quarter of the workers and "
+            "twice the timeout of the previous one; 0 disables",
+        },
+    )
+    adaptive_concurrency: bool = field(
+        default=False,
+        metadata={
+            "help": "Adapt the number of in-flight requests to server latency and errors, capped by --num-workers",
+        },
+    )
+    extract_workers: int = field(
+        default=4,
+        metadata={
+            "help": "Processes extracting solutions off the event loop while generating, 0 extracts inline",
+        },
+    )
+    rpm_limit: int = field(
+        default=0,
+        metadata={
+            "help": "Maximum requests per minute per model, requests are paced evenly; 0 for no limit",
+        },
+    )
+    tpm_limit: int = field(
+        default=0,
+        metadata={
+            "help": "Maximum prompt plus completion tokens per minute per model, estimated up front and corrected "
+            "with the reported usage; 0 for no limit",
+        },
+    )
+    stream: bool = field(
+        default=False,
+        metadata={
+            "help": "Stream completions and record queue time, TTFT, decode time and tokens/s of each sample",
+        },
+    )
+    early_stop: bool = field(
+        default=False,
+        metadata={
+            "help": "Stream completions and cancel them once the dataset's stop condition sees a final answer",
+        },
+    )
+    schedule: str = field(
+        default="random",
+        metadata={
+            "help": "Request order: 'random' spreads samples of a task over the run, "
+            "'prefix' sends them together to the same backend to reuse the prefix cache, "
+            "'longest' sends the tasks with the longest recorded completions first, to shorten the tail",
+        },
+    )
+    length_cap_headroom: float = field(
+        default=0.0,
+        metadata={
+            "help": "Cap max_completion_tokens per task at this multiple of the 95th percentile of its recorded "
+            "completion lengths (e.g. 1.5), samples cut short by a cap are continued with the rest of the budget; "
+            "samples cut inside the reasoning are drawn again uncapped, which slightly favours shorter ones; "
+            "0 disables",
+        },
+    )
+    max_continuations: int = field(
+        default=0,
+        metadata={
+            "help": "Continue samples cut at max_completion_tokens, or by the timeout when streaming, for up to this "
+            "many requests, prefilling the partial answer with continue_final_message (vLLM); 0 disables",
+        },
+    )
+    hedge_percentile: float = field(
+        default=0.0,
+        metadata={
+            "help": "Duplicate requests older than this latency percentile (e.g. 95) on another backend and keep "
+            "the first to finish, the median is used once all work is dispatched; 0 disables hedging",
+        },
+    )
+    metrics_port: int = field(
+        default=0,
+        metadata={
+            "help": "Serve live generation metrics on this port, /metrics in the Prometheus format and "
+            "/metrics.json; 0 disables",
+        },
+    )
+    metrics_host: str = field(
+        default="127.0.0.1",
+        metadata={"help": "Address to serve the metrics on, e.g. 0.0.0.0 to let other hosts scrape them"},
+    )
+    metrics_file: Path | None = field(
+        default=None,
+        metadata={
+            "help": "Periodically rewrite live generation metrics to this file, JSON if it ends with .json "
+            "and the Prometheus text format otherwise",
+        },
+    )
+    response_cache: bool = field(
+        default=False,
+        metadata={
+            "help": "Cache responses on disk keyed by the model, messages, tools, sampling parameters and sample "
+            "index, and answer identical requests from it, e.g. for temperature-0 regression runs",
+        },
+    )
+    response_cache_size: float = field(
+        default=10.0,
+        metadata={
+            "help": "Maximum size of the response cache in GB, least recently used responses are evicted",
+        },
+    )
+    raw_format: str = field(
+        default="jsonl",
+        metadata={
+            "help": "Format of the raw responses: 'jsonl' keeps the full responses, 'zstd' keeps only content, "
+            "reasoning, finish reason, usage and tool calls in zstd-compressed frames (requires zstandard)",
+        },
+    )
+    fsync_interval: float = field(
+        default=5.0,
+        metadata={
+            "help": "Seconds between fsyncs of the output files, 0 fsyncs every write batch and -1 never fsyncs",
         },
     )
     output_dir: Path = field(
@@ -155,10 +360,104 @@ class GenerationConfig:
 
     def __post_init__(self):
         self.output_dir = Path(self.output_dir)
+        if self.seed_from:
+            self.seed_from = Path(self.seed_from)
+            assert self.seed_from.resolve() != self.output_dir.resolve(), "Use --resume to continue in --output-dir"
+        if self.metrics_file:
+            self.metrics_file = Path(self.metrics_file)
+        if self.early_stop:
+            self.stream = True
+        assert self.client in CLIENT_TYPES, f"Client must be one of {CLIENT_TYPES}, got {self.client}"
+        assert self.length_cap_headroom == 0 or self.length_cap_headroom >= 1, (
+            f"Length cap headroom must be 0 or at least 1, got {self.length_cap_headroom}"
+        )
+        assert self.max_continuations >= 0, f"Max continuations must be non-negative, got {self.max_continuations}"
+        assert not (self.max_continuations and self.enable_multiturn), "Continuation does not support multiturn"
+        assert 0 <= self.hedge_percentile < 100, f"Hedge percentile must be in [0, 100), got {self.hedge_percentile}"
+        assert self.raw_format in RAW_FORMATS, f"Raw format must be one of {RAW_FORMATS}, got {self.raw_format}"
+        assert self.schedule in SCHEDULES, f"Schedule must be one of {SCHEDULES}, got {self.schedule}"
         if len(self.tasks) == 1 and "," in self.tasks[0]:
             self.tasks = [task.strip() for task in self.tasks[0].split(",")]
+        if self.api_base and len(self.api_base) == 1 and "," in self.api_base[0]:
+            self.api_base = [url.strip() for url in self.api_base[0].split(",")]
         if self.tool_config:
             self.tool_config = Path(self.tool_config)
+        # normalize the model names once, so that lookups by sampling_params.model match the stripped names
+        self.sampling_params = replace(self.sampling_params, model=",".join(self.models))
+        models = self.models
+        assert len({model_dirname(model) for model in models}) == len(models), f"Model names must differ: {models}"
+        for entry in self.api_base or []:
+            name, sep, _ = entry.partition("=")
+            if sep and not entry.startswith(("http://", "https://")):
+                assert any(name in (model, model_dirname(model)) for model in models), f"Unknown model in {entry}"
+        if self.sweep:
+            self.variants()  # validate the sweep early
+
+    @property
+    def cache_dir(self) -> Path:
+        r"""The evalhub cache directory, shared with the dataset caches."""
+        return Path(os.environ.get("EVALHUB_CACHE_DIR", Path.home() / ".cache" / "evalhub"))
+
+    @property
+    def response_cache_path(self) -> Path:
+        r"""Response cache database, in the evalhub cache directory."""
+        return self.cache_dir / "responses.sqlite3"
+
+    @property
+    def models(self) -> list[str]:
+        r"""The models to generate with, from the comma-separated --model."""
+        return [model.strip() for model in self.sampling_params.model.split(",")]
+
+    def model_api_base(self, model: str) -> list[str] | None:
+        r"""Servers of a model: the ``model=url`` entries of --api-base naming it, or else those without a model."""
+        shared, own = [], []
+        for entry in self.api_base or []:
+            name, sep, url = entry.partition("=")
+            if not sep or entry.startswith(("http://", "https://")):
+                shared.append(entry)
+            elif name in (model, model_dirname(model)):
+                own.append(url)
+        return own or shared or None
+
+    def variants(self) -> list["GenerationConfig"]:
+        r"""Expand the models and the sweep into one config per combination, without either only this config."""
+        models = self.models
+        if len(models) == 1 and not self.sweep:
+            return [self]
+        grid: dict[str, list[str]] = {}
+        for entry in self.sweep.split(";") if self.sweep else []:
+            key, _, values = entry.partition("=")
+            key = key.strip()
+            assert key in [*SWEEP_PARAMS, "system_prompt"], f"Cannot sweep {key}, must be one of {SWEEP_PARAMS}"
+            grid[key] = [value.strip() for value in values.split(",")]
+
+        variants = []
+        for model, combination in itertools.product(models, itertools.product(*grid.values())):
+            values = dict(zip(grid, combination, strict=True))
+            output_dir = self.output_dir / model_dirname(model) if len(models) > 1 else self.output_dir
+            if grid:
+                output_dir /= sweep_dirname(values)
+            system_prompt = self.system_prompt
+            if "system_prompt" in values:
+                prompt = values.pop("system_prompt")
+                system_prompt = SWEEP_SYSTEM_PROMPTS.get(prompt, prompt)
+            sampling_params = replace(
+                self.sampling_params,
+                model=model,
+                **{key: SamplingParams.__dataclass_fields__[key].type(value) for key, value in values.items()},
+            )
+            variants.append(
+                replace(
+                    self,
+                    sampling_params=sampling_params,
+                    system_prompt=system_prompt,
+                    output_dir=output_dir,
+                    seed_from=self.seed_from / output_dir.relative_to(self.output_dir) if self.seed_from else None,
+                    api_base=self.model_api_base(model),
+                    sweep=None,
+                )
+            )
+        return variants
 
     def __setitem__(self, key, value):
         r"""Support dictionary-style item assignment."""
@@ -0,0 +1,129 @@
+import time
+from collections.abc import Callable
+
+RESPONSE_FIELDS = ("id", "object", "created", "model", "system_fingerprint")
+REASONING_FIELDS = ("reasoning_content", "reasoning")
+
+
+class StreamAssembler:
+    r"""Assemble streamed chat completion chunks into a ``ChatCompletion`` dict.
+
+    Chunks are merged incrementally per choice (content, reasoning, tool calls, finish reason), and
+    the arrival time of the first and last token of every choice is recorded.
+    """
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.meta: dict = {}
+        self.choices: dict[int, dict] = {}
+        self.usage: dict | None = None
+        self.first_token: dict[int, float] = {}
+        self.last_token: dict[int, float] = {}
+        self.num_chunks: dict[int, int] = {}
+        self.stopped: dict[int, str] = {}
+        self._checked_length: dict[int, int] = {}
+
+    def add(self, chunk: dict) -> None:
+        r"""Merge one chunk."""
+        now = time.perf_counter()
+        if not self.meta:
+            self.meta = {key: chunk.get(key) for key in RESPONSE_FIELDS if chunk.get(key) is not None}
+            self.meta["object"] = "chat.completion"
+        if chunk.get("usage"):
+            self.usage = chunk["usage"]
+        for delta_choice in chunk.get("choices") or []:
+            index = delta_choice.get("index") or 0
+            if index in self.stopped:
+                continue
+            choice = self.choices.setdefault(
+                index, {"index": index, "message": {"role": "assistant", "content": ""}, "finish_reason": None}
+            )
+            message = choice["message"]
+            delta = delta_choice.get("delta") or {}
+            received = False
+            if delta.get("content"):
+                message["content"] += delta["content"]
+                received = True
+            for key in REASONING_FIELDS:
+                if delta.get(key):
+                    message[key] = message.get(key, "") + delta[key]
+                    received = True
+            for tool_call in delta.get("tool_calls") or []:
+                self._merge_tool_call(message, tool_call)
+                received = True
+            if delta_choice.get("finish_reason"):
+                choice["finish_reason"] = delta_choice["finish_reason"]
+            if received:
+                self.first_token.setdefault(index, now)
+                self.last_token[index] = now
+                self.num_chunks[index] = self.num_chunks.get(index, 0) + 1
+
+    @staticmethod
+    def _merge_tool_call(message: dict, delta: dict) -> None:
+        tool_calls = message.setdefault("tool_calls", [])
+        index = delta.get("index") or 0
+        while len(tool_calls) <= index:
+            tool_calls.append({"id": None, "type": "function", "function": {"name": "", "arguments": ""}})
+        tool_call = tool_calls[index]
+        if delta.get("id"):
+            tool_call["id"] = delta["id"]
+        function = delta.get("function") or {}
+        if function.get("name"):
+            tool_call["function"]["name"] += function["name"]
+        if function.get("arguments"):
+            tool_call["function"]["arguments"] += function["arguments"]
+
+    def check_stop(self, condition: Callable[[str], str | None], num_choices: int = 1, interval: int = 32) -> bool:
+        r"""Apply an early stop condition to the unfinished choices, return whether all choices are done.
+
+        A choice is checked once at least ``interval`` new characters have arrived since its last
+        check, which bounds the cost on long reasoning traces. Stopped choices are marked with
+        ``finish_reason="stop"`` and the reason under ``early_stop``, and ignore further chunks.
+        """
+        for index, choice in self.choices.items():
+            if choice["finish_reason"] is not None:
+                continue
+            content = choice["message"]["content"]
+            if len(content) - self._checked_length.get(index, 0) < interval:
+                continue
+            self._checked_length[index] = len(content)
+            if any(choice["message"].get(key) for key in REASONING_FIELDS):
+                content = "</think>" + content  # the server parsed the think block out of the content
+            if reason := condition(content):
+                self.stopped[index] = reason
+                choice["finish_reason"] = "stop"
+                choice["early_stop"] = reason
+        return len(self.choices) >= num_choices and all(choice["finish_reason"] for choice in self.choices.values())
+
+    def build(self) -> dict:
+        r"""Build the response in the same format as a non-streamed request."""
+        choices = [self.choices[index] for index in sorted(self.choices)]
+        return {**self.meta, "choices": choices, "usage": self.usage}
+
+    def timing(self, queue_time: float = 0.0) -> list[dict[str, float | None]]:
+        r"""Per-choice latency breakdown in seconds.
+
+        ``queue_time`` is the time spent waiting for a client-side concurrency slot, ``ttft`` the
+        time from sending the request to the first token, which includes the server-side queueing
+        and prefill, and ``decode_time`` the time from the first to the last token.
+        """
+        end = time.perf_counter()
+        total_tokens = (self.usage or {}).get("completion_tokens")
+        timings = []
+        for index in sorted(self.choices):
+            first, last = self.first_token.get(index), self.last_token.get(index)
+            num_chunks = self.num_chunks.get(index, 0)
+            # Servers send about one token per chunk, usage is only reported for the whole request
+            num_tokens = total_tokens / len(self.choices) if total_tokens else num_chunks
+            decode_time = last - first if first is not None else None
+            timings.append(
+                {
+                    "queue_time": queue_time,
+                    "ttft": first - self.start if first is not None else None,
+                    "decode_time": decode_time,
+                    "latency": end - self.start,
+                    "tokens_per_second": num_tokens / decode_time if decode_time else None,
+                    "inter_token_latency": decode_time / (num_chunks - 1) if num_chunks > 1 else None,
+                }
+            )
+        return timings
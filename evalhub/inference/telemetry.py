@@ -0,0 +1,156 @@
+import asyncio
+import contextlib
+import os
+import statistics
+import time
+from collections import Counter, defaultdict, deque
+from collections.abc import Callable
+from pathlib import Path
+
+import orjson
+
+from evalhub.utils.logger import logger
+
+PREFIX = "evalhub_"
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+def _format_labels(labels: Labels, **extra: str) -> str:
+    items = [*labels, *extra.items()]
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+class Telemetry:
+    r"""In-process generation metrics, exported in the Prometheus text format or as JSON.
+
+    Counters and per-backend latency histograms are updated by the generator, gauges are read
+    from callbacks at export time. Metrics are served on a local HTTP port (``/metrics`` for
+    Prometheus, ``/metrics.json``) and/or periodically rewritten to a file, in JSON if the file
+    name ends with ``.json`` and in the Prometheus text format otherwise.
+    """
+
+    def __init__(self, window: int = 1000) -> None:
+        self.start = time.monotonic()
+        self.counters: Counter[tuple[str, Labels]] = Counter()
+        self.gauges: dict[str, Callable[[], float]] = {}
+        self.latencies: dict[str, deque[float]] = defaultdict(lambda: deque(maxlen=window))
+        self.histograms: dict[str, list[int]] = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+        self.latency_sums: Counter[str] = Counter()
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        r"""Increment a counter."""
+        self.counters[name, tuple(sorted(labels.items()))] += value
+
+    def gauge(self, name: str, read: Callable[[], float]) -> None:
+        r"""Register a gauge whose value is read from ``read`` at export time."""
+        self.gauges[name] = read
+
+    def observe_response(self, backend: str | None, latency: float, response: dict) -> None:
+        r"""Record the latency, token usage and finish reasons of one successful request."""
+        backend = backend or "default"
+        self.latencies[backend].append(latency)
+        self.latency_sums[backend] += latency
+        histogram = self.histograms[backend]
+        histogram[next((i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound), -1)] += 1
+        usage = response.get("usage") or {}
+        self.inc("prompt_tokens_total", usage.get("prompt_tokens") or 0)
+        self.inc("completion_tokens_total", usage.get("completion_tokens") or 0)
+        for choice in response.get("choices") or []:
+            self.inc("finish_reasons_total", reason=str(choice.get("finish_reason")))
+
+    def snapshot(self) -> dict:
+        r"""All metrics as a JSON-serializable dict."""
+        uptime = time.monotonic() - self.start
+        counters: dict[str, float | dict[str, float]] = {}
+        for (name, labels), value in sorted(self.counters.items()):
+            if labels:
+                key = ",".join(f"{label}={label_value}" for label, label_value in labels)
+                counters.setdefault(name, {})[key] = value
+            else:
+                counters[name] = value
+        latency = {}
+        for backend, values in self.latencies.items():
+            # Percentiles over the most recent requests, with a single request every percentile is its latency
+            quantiles = statistics.quantiles(values, n=100, method="inclusive") if len(values) > 1 else [values[0]] * 99
+            latency[backend] = {"p50": quantiles[49], "p90": quantiles[89], "p99": quantiles[98]}
+        return {
+            "uptime_seconds": uptime,
+            "gauges": {name: read() for name, read in self.gauges.items()},
+            "counters": counters,
+            "prompt_tokens_per_second": self.counters["prompt_tokens_total", ()] / uptime,
+            "completion_tokens_per_second": self.counters["completion_tokens_total", ()] / uptime,
+            "latency_seconds": latency,
+        }
+
+    def render(self) -> str:
+        r"""All metrics in the Prometheus text exposition format."""
+        lines = []
+        for name, read in self.gauges.items():
+            lines += [f"# TYPE {PREFIX}{name} gauge", f"{PREFIX}{name} {read()}"]
+        names = sorted({name for name, _ in self.counters})
+        for name in names:
+            lines.append(f"# TYPE {PREFIX}{name} counter")
+            for (counter, labels), value in sorted(self.counters.items()):
+                if counter == name:
+                    lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value}")
+        if self.histograms:
+            name = f"{PREFIX}request_latency_seconds"
+            lines.append(f"# TYPE {name} histogram")
+            for backend, histogram in self.histograms.items():
+                labels = (("backend", backend),)
+                cumulative = 0
+                for bound, count in zip([*LATENCY_BUCKETS, "+Inf"], histogram, strict=True):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, le=str(bound))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {self.latency_sums[backend]}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await reader.readline()
+            while await reader.readline() not in (b"\r\n", b"\n", b""):
+                pass  # skip the headers
+            parts = request.split()
+            path = parts[1].decode() if len(parts) > 1 else "/"
+            if path.startswith("/metrics.json"):
+                status, content_type, body = "200 OK", "application/json", orjson.dumps(self.snapshot())
+            elif path in ("/", "/metrics"):
+                status, content_type, body = "200 OK", "text/plain; version=0.0.4", self.render().encode()
+            else:
+                status, content_type, body = "404 Not Found", "text/plain", b"not found\n"
+            header = f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\n"
+            writer.write(header.encode() + b"Connection: close\r\n\r\n" + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, port: int, host: str = "127.0.0.1") -> asyncio.Server:
+        r"""Serve the metrics over HTTP until the returned server is closed."""
+        server = await asyncio.start_server(self._handle, host, port)
+        logger.info(f"Serving generation metrics on http://{host}:{port}/metrics")
+        return server
+
+    def write(self, path: Path) -> None:
+        r"""Atomically rewrite the metrics file."""
+        data = orjson.dumps(self.snapshot()) if path.suffix == ".json" else self.render().encode()
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    async def export(self, path: Path, interval: float = 10.0) -> None:
+        r"""Rewrite the metrics file every ``interval`` seconds until cancelled, and once more at the end."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            while True:
+                self.write(path)
+                await asyncio.sleep(interval)
+        finally:
+            with contextlib.suppress(OSError):
+                self.write(path)
@@ -0,0 +1,150 @@
+import asyncio
+import contextlib
+import os
+import time
+from collections import defaultdict
+from collections.abc import Callable
+from pathlib import Path
+
+import orjson
+
+# A batch is written once it holds this many bytes or its oldest record is this old
+BATCH_BYTES = 1 << 20
+BATCH_DELAY = 0.05
+# Unwritten bytes beyond which writers wait for the disk to catch up
+MAX_PENDING_BYTES = 64 << 20
+
+
+def drop_torn_line(path: Path) -> None:
+    r"""Truncate a partially written last line, e.g. after a crash, so that appends start on a new line."""
+    if not path.exists():
+        return
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            size = min(1 << 16, position)
+            f.seek(position - size)
+            chunk = f.read(size)
+            if (newline := chunk.rfind(b"\n")) >= 0:
+                position = position - size + newline + 1
+                break
+            position -= size
+        if position < end:
+            f.truncate(position)
+
+
+class BatchWriter:
+    r"""Append lines to several files in batches, from a single writer task with group commit.
+
+    Records are buffered in memory and written together once the batch reaches ``BATCH_BYTES``, or
+    every ``BATCH_DELAY`` seconds, with one thread hop per batch instead of one per record.
+
+    Files in ``indexes`` get a sidecar index of ``[key, offset, length]`` lines, written after the
+    records they locate. Files in ``encoders`` have each batch encoded as a whole, e.g. into one
+    compressed frame, and their index entries locate that frame.
+
+    Every ``fsync_interval`` seconds a batch is also fsynced, 0 fsyncs every batch and a negative
+    interval leaves it to the OS. Callers wait while more than ``MAX_PENDING_BYTES`` are unwritten.
+    """
+
+    def __init__(
+        self,
+        paths: list[Path],
+        fsync_interval: float = 5.0,
+        indexes: dict[Path, Path] | None = None,
+        encoders: dict[Path, Callable[[bytes], bytes]] | None = None,
+    ) -> None:
+        self.indexes = indexes or {}
+        self.encoders = encoders or {}
+        self.files = {path: open(path, "ab") for path in [*paths, *self.indexes.values()]}
+        self.offsets = {path: f.tell() for path, f in self.files.items()}
+        self.buffers: dict[Path, list[bytes]] = {path: [] for path in paths}
+        self.keys: dict[Path, list[str]] = {path: [] for path in self.indexes}
+        self.fsync_interval = fsync_interval
+        self.last_fsync = time.monotonic()
+        self.pending = 0
+        self.wakeup = asyncio.Event()
+        self.drained = asyncio.Event()
+        self.drained.set()
+        self.closing = False
+        self.task = asyncio.create_task(self._run())
+
+    async def write(self, path: Path, data: bytes, key: str | None = None) -> None:
+        r"""Queue ``data`` to be appended to ``path``, indexed under ``key``, waiting if the disk has fallen behind."""
+        if self.task.done():
+            self.task.result()  # raise the error that stopped the writer
+        self.buffers[path].append(data)
+        if path in self.indexes:
+            self.keys[path].append(key)
+        self.pending += len(data)
+        if self.pending >= BATCH_BYTES:
+            self.wakeup.set()
+        if self.pending >= MAX_PENDING_BYTES:
+            self.drained.clear()
+            await self.drained.wait()
+
+    async def _run(self) -> None:
+        try:
+            while not self.closing:
+                with contextlib.suppress(TimeoutError):
+                    await asyncio.wait_for(self.wakeup.wait(), BATCH_DELAY)
+                self.wakeup.clear()
+                await self._flush()
+            await self._flush(fsync=self.fsync_interval >= 0)
+        finally:
+            self.drained.set()  # do not leave writers waiting if writing failed
+
+    async def _flush(self, fsync: bool = False) -> None:
+        batch = {path: (buffer, self.keys.get(path)) for path, buffer in self.buffers.items() if buffer}
+        if not batch and not fsync:
+            return
+        self.buffers = {path: [] for path in self.buffers}
+        self.keys = {path: [] for path in self.keys}
+        now = time.monotonic()
+        if 0 <= self.fsync_interval <= now - self.last_fsync:
+            fsync = True
+        if fsync:
+            self.last_fsync = now
+        await asyncio.to_thread(self._write, batch, fsync)
+        self.pending -= sum(len(data) for records, _ in batch.values() for data in records)
+        if self.pending < MAX_PENDING_BYTES:
+            self.drained.set()
+
+    def _write(self, batch: dict[Path, tuple[list[bytes], list[str] | None]], fsync: bool) -> None:
+        index_lines: dict[Path, list[bytes]] = defaultdict(list)
+        for path, (records, keys) in batch.items():
+            offset = self.offsets[path]
+            if path in self.encoders:
+                data = self.encoders[path](b"".join(records))
+                locations = [(offset, len(data))] * len(records)
+            else:
+                data = b"".join(records)
+                locations = []
+                for record in records:
+                    locations.append((offset, len(record)))
+                    offset += len(record)
+            self._append(path, data)
+            if keys is not None:
+                lines = index_lines[self.indexes[path]]
+                lines += [orjson.dumps([key, *location]) + b"\n" for key, location in zip(keys, locations, strict=True)]
+        for path, lines in index_lines.items():
+            self._append(path, b"".join(lines))
+        if fsync:
+            for f in self.files.values():
+                os.fsync(f.fileno())
+
+    def _append(self, path: Path, data: bytes) -> None:
+        self.files[path].write(data)
+        self.files[path].flush()
+        self.offsets[path] += len(data)
+
+    async def close(self) -> None:
+        r"""Write and fsync the remaining records, then close the files."""
+        self.closing = True
+        self.wakeup.set()
+        try:
+            await self.task
+        finally:
+            for f in self.files.values():
+                f.close()
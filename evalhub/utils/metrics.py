@@ -1,3 +1,4 @@
+import math
 from collections import Counter
 from typing import Any
 
@@ -11,6 +12,21 @@ def compute_pass_at_k(n: int, c: int, k: int) -> float:
     return float(1.0 - np.prod(1.0 - k / np.arange(n - c + 1, n + 1)))
 
 
+def pass_at_k_posterior(n: int, c: int, k: int) -> tuple[float, float]:
+    r"""Mean and standard deviation of pass@k under the ``Beta(c + 1, n - c + 1)`` posterior of the accuracy.
+
+    pass@k is ``1 - q^k`` with ``q = 1 - p`` following ``Beta(n - c + 1, c + 1)``, whose moments are
+    ``E[q^m] = B(n - c + 1 + m, c + 1) / B(n - c + 1, c + 1)``.
+    """
+    a, b = n - c + 1, c + 1
+
+    def moment(m: int) -> float:
+        return math.exp(math.lgamma(a + m) + math.lgamma(a + b) - math.lgamma(a) - math.lgamma(a + b + m))
+
+    q_k, q_2k = moment(k), moment(2 * k)
+    return 1.0 - q_k, math.sqrt(max(q_2k - q_k**2, 0.0))
+
+
 def get_majority_vote(predictions: list[Any]) -> Any:
     filtered = [p for p in predictions if p is not None]
     if not filtered:
@@ -10,6 +10,7 @@ from rich.syntax import Syntax
 from rich.table import Table
 from rich.text import Text
 
+from evalhub.inference.raw import iter_raw
 from evalhub.utils import console, cprint
 
 
@@ -141,13 +142,52 @@ def display_livecodebench_results(
             break
 
 
+def display_raw_samples(
+    results_path: Path,
+    max_display: int | None = -1,
+):
+    r"""Display raw generation samples, from a JSONL or zstd raw file."""
+    if max_display < 0:
+        max_display = float("inf")
+    cnt = 0
+
+    for _, _, line in iter_raw(results_path):
+        record = orjson.loads(line)
+        response = record["response"]
+        choice = (response.get("choices") or [{}])[0]
+        message = choice.get("message") or {}
+        usage = response.get("usage") or {}
+        content = response.get("content") or message.get("content") or ""
+
+        table = Table(title=record["task_id"], show_header=False, expand=True)
+        table.add_column("Field", style="cyan", width=20)
+        table.add_column("Value")
+        table.add_row("Finish Reason", str(choice.get("finish_reason")))
+        table.add_row("Completion Tokens", str(usage.get("completion_tokens")))
+        if message.get("tool_calls"):
+            table.add_row("Tool Calls", str(len(message["tool_calls"])))
+        table.add_row("Content", Text(content[-1000:]))
+        cprint(table)
+
+        cnt += 1
+        if cnt >= max_display:
+            break
+
+
 def view_results(
     results_path: Path,
     max_display: int | None = -1,
     false_only: bool = True,
 ):
     r"""Unified view function that handles different result formats."""
-    if results_path.suffix.lower() == ".json":
+    if results_path.name.endswith(("_raw.jsonl", "_raw.jsonl.zst")):
+        try:
+            cprint("[blue]Detected raw generation samples[/blue]")
+            display_raw_samples(results_path=results_path, max_display=max_display)
+        except (FileNotFoundError, orjson.JSONDecodeError) as e:
+            cprint(f"[bold red]Error loading raw samples file:[/bold red] {e}")
+            return
+    elif results_path.suffix.lower() == ".json":
         try:
             cprint("[blue]Detected LiveCodeBench results format[/blue]")
             display_livecodebench_results(
@@ -0,0 +1,71 @@
+"""Measure client-side CPU time per request of the generation API clients.
+
+Example:
+    python scripts/bench_client.py --model hosted_vllm/Qwen/Qwen3-30B-A3B-Instruct-2507 \
+        --api-base http://0.0.0.0:30000/v1 --requests 2048 --concurrency 1024
+
+"""
+
+import argparse
+import asyncio
+import time
+
+from rich.console import Console
+from rich.table import Table
+
+from evalhub.inference.client import CLIENTS
+
+console = Console()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model", type=str, required=True)
+    parser.add_argument("--api-base", type=str, default=None)
+    parser.add_argument("--clients", type=str, default=",".join(CLIENTS))
+    parser.add_argument("--requests", type=int, default=1024)
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--max-completion-tokens", type=int, default=16)
+    return parser.parse_args()
+
+
+async def bench(name: str, args: argparse.Namespace) -> tuple[float, float, int]:
+    client = CLIENTS[name](max_connections=args.concurrency)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    params = {
+        "model": args.model,
+        "api_base": args.api_base,
+        "messages": [{"role": "user", "content": "Say hello."}],
+        "max_completion_tokens": args.max_completion_tokens,
+        "temperature": 0.0,
+        "timeout": 600,
+    }
+    errors = 0
+
+    async def request() -> None:
+        nonlocal errors
+        async with semaphore:
+            try:
+                await client.chat(params)
+            except Exception:
+                errors += 1
+
+    await request()  # warm up imports and connections
+    cpu_start, wall_start = time.process_time(), time.perf_counter()
+    await asyncio.gather(*(request() for _ in range(args.requests)))
+    cpu, wall = time.process_time() - cpu_start, time.perf_counter() - wall_start
+    await client.close()
+    return cpu, wall, errors
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    table = Table(title=f"Client overhead ({args.requests} requests, concurrency {args.concurrency})")
+    table.add_column("Client", style="cyan")
+    table.add_column("CPU ms / request", style="green")
+    table.add_column("Requests / s", style="green")
+    table.add_column("Errors", style="red")
+    for name in args.clients.split(","):
+        cpu, wall, errors = asyncio.run(bench(name.strip(), args))
+        table.add_row(name, f"{cpu / args.requests * 1000:.3f}", f"{args.requests / wall:.1f}", str(errors))
+    console.print(table)
@@ -0,0 +1,149 @@
+from collections.abc import AsyncIterator, Callable
+
+import orjson
+import pytest
+
+from evalhub.benchmarks.base import Dataset, Task
+from evalhub.inference.client import BaseClient
+from evalhub.inference.generator import LLMGenerator
+from evalhub.inference.schemas import GenerationConfig, SamplingParams
+
+MODEL = "hosted_vllm/fake"
+USAGE = {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+
+
+def completion(content: str, finish_reason: str | None = "stop", usage: dict | None = USAGE, **message) -> dict:
+    r"""Non-streamed response with a single choice."""
+    message = {"role": "assistant", "content": content, **message}
+    choice = {"index": 0, "message": message, "finish_reason": finish_reason}
+    return {"id": "chatcmpl-fake", "choices": [choice], "usage": usage}
+
+
+def chunks(response: dict) -> list[dict]:
+    r"""Stream chunks of a response: pieces of 4 characters of every choice, its finish reason, then the usage."""
+    stream = []
+    for choice in response["choices"]:
+        message = choice["message"]
+        for key in ("reasoning_content", "content"):
+            text = message.get(key) or ""
+            for start in range(0, len(text), 4):
+                delta = {key: text[start : start + 4]}
+                stream.append({"id": response["id"], "choices": [{"index": choice["index"], "delta": delta}]})
+        finish = {"index": choice["index"], "delta": {}, "finish_reason": choice["finish_reason"]}
+        stream.append({"id": response["id"], "choices": [finish]})
+    stream.append({"id": response["id"], "choices": [], "usage": response.get("usage")})
+    return stream
+
+
+class FakeClient(BaseClient):
+    r"""Client answering every request by ``reply``, by default with a new numbered sample.
+
+    ``reply`` maps the request parameters to a response, the content of a response or an exception
+    to raise. Requests are recorded in ``requests``.
+    """
+
+    def __init__(self, reply: Callable[[dict], dict | str | Exception] | None = None) -> None:
+        super().__init__()
+        self.reply = reply or (lambda params: f"sample {len(self.requests)}")
+        self.requests: list[dict] = []
+
+    def respond(self, params: dict) -> dict:
+        self.requests.append(params)
+        response = self.reply(params)
+        if isinstance(response, Exception):
+            raise response
+        return completion(response) if isinstance(response, str) else response
+
+    async def chat(self, params: dict) -> dict:
+        return self.respond(params)
+
+    async def stream(self, params: dict) -> AsyncIterator[dict]:
+        for chunk in chunks(self.respond(params)):
+            yield chunk
+
+
+class Prompts(Dataset):
+    r"""One task per prompt, ``prompts/0``, ``prompts/1``..."""
+
+    def __init__(self, prompts: list[str], **kwargs) -> None:
+        self.prompts = prompts
+        super().__init__("prompts", meta_data={"prompts": prompts}, **kwargs)
+
+    def load_tasks(self) -> None:
+        for i, prompt in enumerate(self.prompts):
+            self.add_task(Task(task_id=f"prompts/{i}", prompt=prompt))
+
+    def format_prompt(self, task: dict) -> str:
+        return task["prompt"]
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    r"""Keep the dataset, length and response caches of each test apart from each other and from the user's."""
+    path = tmp_path / "cache"
+    monkeypatch.setenv("EVALHUB_CACHE_DIR", str(path))
+    return path
+
+
+@pytest.fixture
+def client() -> FakeClient:
+    return FakeClient()
+
+
+@pytest.fixture
+def dataset() -> Prompts:
+    r"""The ``prompts`` dataset of four tasks, built without a generation config."""
+    return Prompts(["1 + 1", "2 + 2", "3 + 3", "4 + 4"])
+
+
+@pytest.fixture(name="completion")
+def completion_fixture() -> Callable[..., dict]:
+    return completion
+
+
+@pytest.fixture(name="chunks")
+def chunks_fixture() -> Callable[[dict], list[dict]]:
+    return chunks
+
+
+@pytest.fixture
+def make_config(tmp_path) -> Callable[..., GenerationConfig]:
+    r"""Build the generation config of the ``prompts`` dataset, sampling parameters are passed alongside."""
+
+    def make_config(**kwargs) -> GenerationConfig:
+        sampling = {key: kwargs.pop(key) for key in list(kwargs) if key in SamplingParams.__dataclass_fields__}
+        kwargs = {"output_dir": tmp_path, "extract_workers": 0, **kwargs}
+        return GenerationConfig(
+            tasks=["prompts"],
+            sampling_params=SamplingParams(**{"model": MODEL, **sampling}),
+            tool_config=None,
+            callback=None,
+            **kwargs,
+        )
+
+    return make_config
+
+
+@pytest.fixture
+def make_generator(make_config) -> Callable[..., LLMGenerator]:
+    r"""Build a generator sending its requests to ``client``."""
+
+    def make_generator(client: BaseClient, **kwargs) -> LLMGenerator:
+        generator = LLMGenerator(make_config(**kwargs))
+        generator.client = client
+        return generator
+
+    return make_generator
+
+
+@pytest.fixture
+def generate() -> Callable[..., list[dict]]:
+    r"""Generate the ``prompts`` dataset, returning the raw records."""
+
+    def generate(generator: LLMGenerator, prompts: list[str] = ("1 + 1",)) -> list[dict]:
+        config = generator.config
+        generator.generate(Prompts(list(prompts), config=config))
+        raw = config.output_dir / "prompts_raw.jsonl"
+        return [orjson.loads(line) for line in raw.read_bytes().splitlines()]
+
+    return generate
@@ -0,0 +1,34 @@
+from evalhub.inference.adaptive import AdaptiveStopping
+
+
+def test_unanimous_task_stops_early():
+    stopping = AdaptiveStopping(min_samples=8, tolerance=0.05)
+    stopped = [stopping.update("task/0", "2", True) for _ in range(64)]
+    assert stopped.count(True) == 1
+    assert 8 <= stopping.num_samples["task/0"] - stopped[::-1].index(True) < 32
+
+
+def test_split_task_keeps_sampling():
+    stopping = AdaptiveStopping(min_samples=8, tolerance=0.05)
+    assert not any(stopping.update("task/0", str(i % 2), i % 2 == 0) for i in range(64))
+    assert stopping.summary() == {"task/0": {"num_samples": 64, "num_correct": 32, "stopped_early": False}}
+
+
+def test_impossible_task_stops_without_majority():
+    stopping = AdaptiveStopping(min_samples=8, tolerance=0.05)
+    stopped = [stopping.update("task/0", str(i), False) for i in range(64)]
+    assert stopped.count(True) == 1
+    assert stopped.index(True) < 32
+
+
+def test_impossible_task_keeps_sampling_while_pass_at_k_is_unsettled():
+    # 18 wrong samples leave pass@64 around 0.77 under the posterior, far from settled at 0
+    stopping = AdaptiveStopping(min_samples=8, tolerance=0.05, max_k=64)
+    assert not any(stopping.update("task/0", str(i), False) for i in range(64))
+
+
+def test_unanimous_task_stops_once_every_pass_at_k_is_settled():
+    stopping = AdaptiveStopping(min_samples=8, tolerance=0.05, max_k=64)
+    stopped = [stopping.update("task/0", "2", True) for _ in range(64)]
+    assert stopped.count(True) == 1
+    assert stopping.ks == [1, 2, 4, 8, 16, 32, 64]
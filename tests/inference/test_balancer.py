@@ -0,0 +1,90 @@
+import asyncio
+import time
+
+import pytest
+
+from evalhub.inference.balancer import LoadBalancer
+
+URLS = [f"http://127.0.0.1:{10086 + i}/v1" for i in range(4)]
+
+
+def test_least_loaded():
+    balancer = LoadBalancer(URLS)
+    for i, backend in enumerate(balancer.backends):
+        backend.outstanding = 4 - i
+        backend.latency = 1.0
+    assert balancer.select().url == URLS[-1]
+
+
+@pytest.mark.parametrize("task_id", ["AIME2024/0", "MATH500/127", "LiveCodeBench/abc123"])
+def test_affinity_is_stable(task_id):
+    balancer = LoadBalancer(URLS)
+    pinned = balancer.select(task_id)
+    assert all(balancer.select(task_id) is pinned for _ in range(10))
+
+    # Removing another backend does not move the key
+    other = next(backend for backend in balancer.backends if backend is not pinned)
+    other.down_until = float("inf")
+    assert balancer.select(task_id) is pinned
+
+
+def test_affinity_bounded_load():
+    balancer = LoadBalancer(URLS)
+    pinned = balancer.select("AIME2024/0")
+    pinned.outstanding = 100
+    assert balancer.select("AIME2024/0") is not pinned
+
+
+def test_exclude_avoids_primary_backend():
+    balancer = LoadBalancer(URLS[:2])
+    primary = balancer.select("AIME2024/0")
+    assert all(balancer.select("AIME2024/0", exclude={primary.url}) is not primary for _ in range(10))
+
+    # Falls back to the excluded backend if it is the only one left
+    other = next(backend for backend in balancer.backends if backend is not primary)
+    other.down_until = float("inf")
+    assert balancer.select(exclude={primary.url}) is primary
+
+
+def test_failing_backend_leaves_rotation():
+    balancer = LoadBalancer(URLS[:2], max_failures=2)
+    failing = balancer.backends[0]
+    for _ in range(2):
+        balancer.on_error(failing, ConnectionError("refused"))
+    assert not failing.healthy
+    assert all(balancer.select() is balancer.backends[1] for _ in range(10))
+
+
+def test_circuit_probe_closes_on_success():
+    balancer = LoadBalancer(URLS[:1], max_failures=2, cooldown=0.0)
+    backend = balancer.backends[0]
+    for _ in range(2):
+        balancer.on_error(backend, ConnectionError("refused"))
+    assert backend.tripped
+
+    balancer.on_success(backend, 1.0, probe=True)
+    assert not backend.tripped and backend.available
+
+
+def test_tripped_backend_gets_single_probe_after_cooldown():
+    balancer = LoadBalancer(URLS[:1], max_failures=1, cooldown=0.2)
+    backend = balancer.backends[0]
+    balancer.on_error(backend, ConnectionError("refused"))
+    assert balancer.select() is None
+
+    async def request(sent: list[float]) -> None:
+        async with balancer.track() as selected:
+            sent.append(time.monotonic())
+            assert selected is backend
+            await asyncio.sleep(0.1)
+
+    async def run() -> list[float]:
+        sent = []
+        await asyncio.gather(*(request(sent) for _ in range(3)))
+        return sent
+
+    start = time.monotonic()
+    first, *rest = asyncio.run(run())
+    # The probe waits for the cooldown, the other requests for the probe to close the circuit
+    assert first - start >= 0.2
+    assert all(sent - first >= 0.1 for sent in rest)
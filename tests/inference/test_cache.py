@@ -0,0 +1,42 @@
+import orjson
+
+from evalhub.inference.cache import ResponseCache, cache_key
+
+PARAMS = {"model": "qwen", "messages": [{"role": "user", "content": "1 + 1"}], "temperature": 0.0, "timeout": 60}
+
+
+def test_cache_key_ignores_timeout_and_keeps_samples_apart():
+    assert cache_key(PARAMS, ("0",)) == cache_key({**PARAMS, "timeout": 600}, ("0",))
+    assert cache_key(PARAMS, ("0",)) != cache_key(PARAMS, ("1",))
+
+
+def test_lru_eviction(tmp_path):
+    response = {"choices": [{"message": {"content": "x" * 100}}], "usage": {"total_tokens": 10}}
+    size = len(orjson.dumps(response))
+    cache = ResponseCache(tmp_path / "responses.sqlite3", max_size=3 * size + size // 2)
+    for key in "abc":
+        cache.put(key, response)
+    assert cache.get("a") is not None  # a is now more recently used than b
+    cache.put("d", response)
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert (cache.hits, cache.misses, cache.tokens_saved) == (2, 1, 20)
+
+
+def test_resume_does_not_replay_saved_samples(client, make_generator, generate):
+    prompts = [f"prompt {i}" for i in range(3)]
+    for n_samples, resume in ((2, False), (4, True)):
+        records = generate(make_generator(client, n_samples=n_samples, resume=resume, response_cache=True), prompts)
+    contents = [record["response"]["choices"][0]["message"]["content"] for record in records]
+    assert len(contents) == 12
+    assert len(set(contents)) == 12
+
+
+def test_early_stopped_responses_are_not_replayed_without_early_stop(client, make_generator, generate):
+    records = generate(make_generator(client, stream=True, early_stop=True, response_cache=True))
+    assert "timing" in records[0]["response"]
+    records = generate(make_generator(client, stream=True, early_stop=True, response_cache=True))
+    assert len(client.requests) == 1
+    assert "timing" not in records[-1]["response"]
+    generate(make_generator(client, stream=True, response_cache=True))
+    assert len(client.requests) == 2
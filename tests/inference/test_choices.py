@@ -0,0 +1,47 @@
+from evalhub.inference.generator import share_usage
+from evalhub.inference.scheduler import chunk_sample_ids
+
+
+def choices(n: int, returned: int | None = None) -> dict:
+    r"""Response with ``returned`` of the ``n`` requested choices, all of them by default."""
+    returned = n if returned is None else returned
+    return {
+        "id": "chatcmpl-fake",
+        "choices": [
+            {"index": i, "message": {"role": "assistant", "content": f"choice {i}"}, "finish_reason": "stop"}
+            for i in range(returned)
+        ],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 3 * returned, "total_tokens": 10 + 3 * returned},
+    }
+
+
+def test_sample_ids_are_chunked_by_request():
+    assert chunk_sample_ids(5, 2) == [["0", "1"], ["2", "3"], ["4"]]
+    assert chunk_sample_ids(2, 4) == [["0", "1"]]
+
+
+def test_choices_share_the_usage_of_their_request():
+    usage = {"prompt_tokens": 10, "completion_tokens": 7, "details": {"cached_tokens": 3}}
+    shares = [share_usage(usage, position, 3) for position in range(3)]
+    assert [share["completion_tokens"] for share in shares] == [3, 2, 2]
+    assert sum(share["prompt_tokens"] for share in shares) == 10
+    assert sum(share["details"]["cached_tokens"] for share in shares) == 3
+
+
+def test_samples_are_fetched_n_per_request(client, make_generator, generate):
+    client.reply = lambda params: choices(params.get("n", 1))
+    records = generate(make_generator(client, n_samples=5, samples_per_request=2))
+
+    assert sorted(params.get("n", 1) for params in client.requests) == [1, 2, 2]
+    assert len(records) == 5
+    assert sum(record["response"]["usage"]["completion_tokens"] for record in records) == 15
+    assert [record["response"].get("num_choices") for record in records].count(2) == 4
+
+
+def test_missing_choices_are_requested_again(client, make_generator, generate):
+    # The first request returns only one of its two choices
+    client.reply = lambda params: choices(params.get("n", 1), returned=1)
+    records = generate(make_generator(client, n_samples=2, samples_per_request=2))
+
+    assert [params.get("n", 1) for params in client.requests] == [2, 1]
+    assert len(records) == 2
@@ -0,0 +1,56 @@
+import asyncio
+from contextlib import aclosing
+
+from evalhub.inference import client as client_module
+from evalhub.inference.client import LiteLLMClient
+
+
+class Chunk(dict):
+    def model_dump(self) -> dict:
+        return dict(self)
+
+
+class StreamWrapper:
+    r"""Stands in for litellm's ``CustomStreamWrapper``, recording whether it was closed."""
+
+    def __init__(self) -> None:
+        self.closed = False
+
+    async def __aiter__(self):
+        for i in range(100):
+            yield Chunk(choices=[{"index": 0, "delta": {"content": str(i)}}])
+            await asyncio.sleep(0)
+
+    async def aclose(self) -> None:
+        self.closed = True
+
+
+def test_litellm_stream_is_closed_when_abandoned(monkeypatch):
+    streams = []
+
+    async def acompletion(**params):
+        streams.append(StreamWrapper())
+        return streams[-1]
+
+    monkeypatch.setattr(client_module, "acompletion", acompletion)
+    client = LiteLLMClient()
+
+    async def early_stop() -> None:
+        async with aclosing(client.stream({"model": "fake"})) as chunks:
+            async for chunk in chunks:
+                if chunk["choices"][0]["delta"]["content"] == "2":
+                    break
+
+    async def cancel() -> None:
+        async def consume() -> None:
+            async for _ in client.stream({"model": "fake"}):
+                await asyncio.sleep(1)
+
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(early_stop())
+    asyncio.run(cancel())
+    assert [stream.closed for stream in streams] == [True, True]
@@ -0,0 +1,20 @@
+def test_multi_hop_continuation_is_stitched(client, completion, make_generator, generate):
+    usage = {"prompt_tokens": 10, "completion_tokens": 4, "total_tokens": 14}
+    pieces = [
+        completion("part 1", "length", usage, reasoning_content="think 1"),
+        completion(" part 2", "length", None, reasoning_content=" think 2"),
+        completion(" part 3", "stop", usage),
+    ]
+    client.reply = lambda params: pieces[len(client.requests) - 1]
+    records = generate(make_generator(client, max_continuations=3))
+
+    # Each continuation prefills the content so far
+    assert [params["messages"][-1]["content"] for params in client.requests[1:]] == ["part 1", "part 1 part 2"]
+    response = records[0]["response"]
+    message = response["choices"][0]["message"]
+    assert message["content"] == "part 1 part 2 part 3"
+    assert message["reasoning_content"] == "think 1 think 2"
+    assert response["choices"][0]["finish_reason"] == "stop"
+    assert response["continuations"] == 2
+    assert response["usage"] == {"prompt_tokens": 20, "completion_tokens": 8, "total_tokens": 28}
+    assert response["usage_partial"]
@@ -0,0 +1,49 @@
+import orjson
+
+from evalhub.benchmarks.base import GroundTruth, Task
+from evalhub.benchmarks.math.base import MathDataset
+
+
+class Arithmetic(MathDataset):
+    r"""Doubling tasks ``prompts/0``, ``prompts/1``... graded against their boxed answer."""
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__("prompts", **kwargs)
+
+    def load_tasks(self) -> None:
+        for i in range(4):
+            self.add_task(Task(task_id=f"prompts/{i}", prompt=f"{i} + {i}"))
+            self.add_groundtruth(GroundTruth(task_id=f"prompts/{i}", answer=str(2 * i)))
+
+    def format_prompt(self, task: dict) -> str:
+        return task["prompt"]
+
+
+def reply(params: dict) -> str:
+    a, _, b = params["messages"][-1]["content"].partition(" + ")
+    # tasks 0 and 2 are answered right, 1 and 3 wrong
+    return f"<think>{a} plus {b}</think>The answer is $\\boxed{{{int(a) + int(b) + int(a) % 2}}}$."
+
+
+def test_extraction_pool_matches_inline_extraction(client, make_generator, tmp_path):
+    client.reply = reply
+    outputs = {}
+    for workers in (0, 2):
+        output_dir = tmp_path / f"workers-{workers}"
+        output_dir.mkdir()
+        generator = make_generator(
+            client, output_dir=output_dir, extract_workers=workers, n_samples=2, adaptive_sampling=True
+        )
+        generator.generate(Arithmetic(config=generator.config))
+        solutions = sorted(map(orjson.loads, (output_dir / "prompts.jsonl").read_bytes().splitlines()), key=str)
+        outputs[workers] = solutions, orjson.loads((output_dir / "prompts_samples.json").read_bytes())
+
+    assert outputs[2] == outputs[0]
+    solutions, counts = outputs[0]
+    assert {solution["solution"] for solution in solutions} == {"0", "3", "4", "7"}
+    assert {task_id: count["num_correct"] for task_id, count in counts.items()} == {
+        "prompts/0": 2,
+        "prompts/1": 0,
+        "prompts/2": 2,
+        "prompts/3": 0,
+    }
@@ -0,0 +1,32 @@
+import asyncio
+
+from evalhub.inference.hedging import HEDGED, HedgePolicy
+
+
+async def request(seconds: float) -> str:
+    if HEDGED.get() is not None:
+        return "hedge"
+    await asyncio.sleep(seconds)
+    return "primary"
+
+
+def test_straggler_is_hedged_once_the_window_fills():
+    policy = HedgePolicy(percentile=50, min_samples=2, poll_interval=60)
+
+    async def main():
+        straggler = asyncio.create_task(policy.run(lambda: request(60), is_tail=lambda: False))
+        await asyncio.sleep(0.01)
+        for _ in range(2):
+            assert await policy.run(lambda: request(0.01), is_tail=lambda: False) == "primary"
+        # Woken up by the filled window rather than by the next poll a minute later
+        return await asyncio.wait_for(straggler, timeout=5)
+
+    assert asyncio.run(main()) == "hedge"
+    assert policy.num_hedged == policy.num_hedge_wins == 1
+
+
+def test_window_outlives_the_event_loop():
+    policy = HedgePolicy(min_samples=2)
+    for _ in range(2):
+        assert asyncio.run(policy.run(lambda: request(0), is_tail=lambda: False)) == "primary"
+    assert policy.delay(tail=False) is not None
@@ -0,0 +1,54 @@
+from evalhub.inference.lengths import LengthDatabase, LengthRecorder, model_family, token_cap
+
+
+def test_model_family_strips_provider_and_checkpoint():
+    assert model_family("hosted_vllm//data/models/Qwen2.5-7B-Instruct/checkpoint-500/") == "qwen2.5-7b-instruct"
+    assert model_family("openai/gpt-4o") == "gpt-4o"
+
+
+def test_token_cap_needs_enough_observations():
+    assert token_cap([100] * 7, 1.5, 4096) is None
+    assert token_cap([100] * 8, 1.5, 4096) == 150
+    assert token_cap([4000] * 8, 1.5, 4096) is None
+
+
+def test_database_merges_runs(tmp_path):
+    database = LengthDatabase(tmp_path / "lengths.sqlite3")
+    for _ in range(2):
+        recorder = LengthRecorder()
+        recorder.update("task/0", {"choices": [{"finish_reason": "stop"}], "usage": {"completion_tokens": 40}})
+        recorder.update("task/0", {"choices": [{"finish_reason": "length"}], "num_choices": 2})
+        database.save("qwen", "math", recorder)
+    assert database.load("qwen", "math") == {"task/0": [40, 40]}
+    assert database.db.execute("SELECT num_samples, num_truncated FROM lengths").fetchone() == (4, 2)
+
+
+def test_capped_samples_are_continued(client, cache_dir, completion, make_generator, generate):
+    recorder = LengthRecorder()
+    for _ in range(8):
+        recorder.update("prompts/0", completion("", usage={"completion_tokens": 100}))
+    LengthDatabase(cache_dir / "lengths.sqlite3").save("fake", "prompts", recorder)
+
+    def reply(params):
+        if params["messages"][-1]["role"] == "assistant":
+            return " part 2"
+        if params["max_completion_tokens"] == 1000:
+            return "redrawn"
+        # one sample is cut in its content, the other inside its reasoning
+        capped = [request for request in client.requests if request["max_completion_tokens"] == 150]
+        return completion("part 1" if len(capped) == 1 else "", "length", reasoning_content="think")
+
+    client.reply = reply
+    generator = make_generator(client, n_samples=2, max_completion_tokens=1000, length_cap_headroom=1.5)
+    records = generate(generator)
+
+    contents = sorted(record["response"]["choices"][0]["message"]["content"] for record in records)
+    assert contents == ["part 1 part 2", "redrawn"]
+    # The continuation gets the rest of the budget, the sample without content is drawn again uncapped
+    budgets = sorted(request["max_completion_tokens"] for request in client.requests)
+    assert budgets == [150, 150, 850, 1000]
+
+
+def test_lengths_are_only_recorded_for_caps_and_longest_schedule(client, cache_dir, make_generator, generate):
+    generate(make_generator(client))
+    assert not (cache_dir / "lengths.sqlite3").exists()
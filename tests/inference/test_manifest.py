@@ -0,0 +1,22 @@
+import pytest
+
+from evalhub.inference.manifest import build_manifest, manifest_mismatches
+from evalhub.inference.schemas import SamplingParams
+
+
+def test_manifest_ignores_timeout_and_reports_mismatches():
+    previous = build_manifest(SamplingParams(model="qwen", timeout=60), None, {"version": ("v1",)})
+    same = build_manifest(SamplingParams(model="qwen", timeout=600), None, {"version": ["v1"]})
+    assert manifest_mismatches(previous, same) == []
+    current = build_manifest(SamplingParams(model="qwen", temperature=1.0), "Think step by step.", {"version": ("v1",)})
+    assert manifest_mismatches(previous, current) == [
+        "temperature: 0.6 != 1.0",
+        "system_prompt: None != 'Think step by step.'",
+    ]
+
+
+def test_resume_refuses_changed_settings(client, make_generator, generate):
+    generate(make_generator(client, n_samples=2))
+    generate(make_generator(client, n_samples=2, resume=True))
+    with pytest.raises(AssertionError, match="max_continuations: 0 != 2"):
+        generate(make_generator(client, n_samples=2, resume=True, max_continuations=2))
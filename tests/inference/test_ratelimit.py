@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from evalhub.inference.ratelimit import RateLimiter, estimate_prompt_tokens
+from evalhub.inference.scheduler import CURRENT_JOB, Job
+
+
+@pytest.mark.parametrize(("actual", "charged"), [(100, 100), (None, 50)])
+def test_settle_corrects_estimate_with_usage_or_consumed_tokens(actual, charged):
+    # A slow refill, so that the level only moves with the charges
+    limiter = RateLimiter(tpm=60)
+    bucket = limiter.buckets["tokens"]
+    asyncio.run(limiter.acquire(600))
+    limiter.settle(600, actual, consumed=50)
+    assert bucket.level == pytest.approx(bucket.capacity - charged, abs=0.5)
+
+
+def test_failed_request_is_charged_its_prompt(client, make_generator):
+    client.reply = lambda params: ConnectionError("refused")
+    generator = make_generator(client, max_completion_tokens=500, tpm_limit=6000)
+    bucket = generator.endpoints["hosted_vllm/fake"].rate_limiter.buckets["tokens"]
+    messages = [{"role": "user", "content": "1 + 1"}]
+    with pytest.raises(ConnectionError):
+        asyncio.run(generator._complete(messages))
+    assert bucket.level == pytest.approx(bucket.capacity - estimate_prompt_tokens({"messages": messages}), abs=1)
+
+
+def test_early_stopped_stream_is_charged_its_streamed_tokens(client, make_generator):
+    # Stops at the first check, before the usage chunk arrives
+    client.reply = lambda params: "x" * 64
+    # A slow refill, so that the level only moves with the charges
+    generator = make_generator(client, max_completion_tokens=500, tpm_limit=60, stream=True)
+    bucket = generator.endpoints["hosted_vllm/fake"].rate_limiter.buckets["tokens"]
+    messages = [{"role": "user", "content": "1 + 1"}]
+
+    async def complete() -> dict:
+        token = CURRENT_JOB.set(Job(dataset=None, stop_condition=lambda content: "done"))
+        try:
+            return await generator._complete(messages)
+        finally:
+            CURRENT_JOB.reset(token)
+
+    response = asyncio.run(complete())
+    assert response["usage"] is None
+    streamed = 32 // 4  # stopped at the first check, once 32 characters arrived in chunks of 4
+    charged = estimate_prompt_tokens({"messages": messages}) + streamed
+    assert bucket.level == pytest.approx(bucket.capacity - charged, abs=0.5)
@@ -0,0 +1,29 @@
+from collections import Counter
+
+from evalhub.inference import generator as generator_module
+
+
+class BadRequestError(Exception):
+    status_code = 400
+
+
+def reply(params: dict) -> str | Exception:
+    r"""Reject the invalid prompt and drop the connection of every request to the flaky prompt."""
+    prompt = params["messages"][-1]["content"]
+    if prompt == "invalid":
+        return BadRequestError("context length exceeded")
+    if prompt == "flaky":
+        return ConnectionError("connection reset")
+    return "ok"
+
+
+def test_retry_passes_skip_fatal_errors(client, make_generator, generate, monkeypatch):
+    monkeypatch.setattr(generator_module, "backoff", lambda *args: 0.0)
+    client.reply = reply
+    generator = make_generator(client, retry_passes=2)
+    # Let the probe through at once when the flaky backend opens its circuit
+    generator.endpoints["hosted_vllm/fake"].balancer.cooldown = 0.0
+    generate(generator, ["valid", "invalid", "flaky"])
+    # Transient failures are retried within each pass and drawn again in both retry passes
+    num_requests = Counter(params["messages"][-1]["content"] for params in client.requests)
+    assert num_requests == {"valid": 1, "invalid": 1, "flaky": 9}
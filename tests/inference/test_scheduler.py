@@ -0,0 +1,65 @@
+import copy
+from collections import Counter
+
+from evalhub.inference.scheduler import Job, WorkItem, WorkQueue, iter_job_work_items, iter_work_items
+
+
+def order(items) -> list[tuple[str, list[str]]]:
+    return [(item.task.task_id, item.sample_ids) for item in items]
+
+
+def test_random_schedule_spreads_the_samples_of_each_task(dataset):
+    pending = {"prompts/0": 3, "prompts/1": 1, "prompts/2": 2, "prompts/3": 0}
+    items = order(iter_work_items(dataset, pending))
+
+    # One sample of every unfinished task per round
+    assert [sample_ids for _, sample_ids in items] == [["0"], ["0"], ["0"], ["1"], ["1"], ["2"]]
+    assert sorted(task_id for task_id, _ in items[:3]) == ["prompts/0", "prompts/1", "prompts/2"]
+    assert Counter(task_id for task_id, _ in items) == {"prompts/0": 3, "prompts/1": 1, "prompts/2": 2}
+
+
+def test_prefix_schedule_sends_a_task_ahead_of_its_siblings(dataset):
+    items = order(iter_work_items(dataset, {"prompts/0": 3, "prompts/1": 3}, "prefix"))
+
+    first, second = items[0][0], items[1][0]
+    assert items == [
+        (first, ["0"]),
+        (second, ["0"]),
+        (first, ["1"]),
+        (first, ["2"]),
+        (second, ["1"]),
+        (second, ["2"]),
+    ]
+
+
+def test_longest_schedule_sends_unrecorded_then_longest_tasks_first(dataset):
+    pending = dict.fromkeys(dataset.task_ids, 1)
+    expected_lengths = {"prompts/0": 100.0, "prompts/1": 300.0, "prompts/2": 200.0}
+    items = order(iter_work_items(dataset, pending, "longest", expected_lengths=expected_lengths))
+    assert [task_id for task_id, _ in items] == ["prompts/3", "prompts/1", "prompts/2", "prompts/0"]
+
+
+def test_jobs_of_a_dataset_are_interleaved(dataset):
+    variant = Job(dataset, pending={"prompts/0": 2})
+    # a job topping up an earlier run continues after its saved samples
+    topped_up = Job(dataset, pending={"prompts/0": 2}, num_saved={"prompts/0": 4})
+    renamed = copy.copy(dataset)
+    renamed.name = "other"
+    other = Job(renamed, pending={"prompts/1": 1})
+
+    items = list(iter_job_work_items([variant, topped_up, other]))
+    assert [(item.job, item.sample_ids) for item in items] == [
+        (variant, ["0"]),
+        (topped_up, ["4"]),
+        (variant, ["1"]),
+        (topped_up, ["5"]),
+        (other, ["0"]),
+    ]
+
+
+def test_requeued_items_go_first(dataset):
+    work = WorkQueue(iter_work_items(dataset, {"prompts/0": 2}))
+    first = next(work)
+    work.requeue(WorkItem(first.task, first.sample_ids))
+    assert order(work) == [("prompts/0", ["0"]), ("prompts/0", ["1"])]
+    assert work.exhausted
@@ -0,0 +1,38 @@
+import hashlib
+
+from evalhub.inference.schemas import sweep_dirname
+
+
+def test_model_names_are_stripped(client, make_config, make_generator, generate):
+    variants = make_config(model="hosted_vllm/a, hosted_vllm/b").variants()
+    assert [variant.sampling_params.model for variant in variants] == ["hosted_vllm/a", "hosted_vllm/b"]
+
+    generate(make_generator(client, model=" hosted_vllm/fake "))
+    assert client.requests[-1]["model"] == "hosted_vllm/fake"
+
+
+def test_sweep_names_hash_free_form_system_prompts(make_config, tmp_path):
+    prompt = "You are a careful mathematician. Think step by step."
+    config = make_config(sweep=f"temperature=0.0, 0.6; system_prompt=none,{prompt}")
+    variants = config.variants()
+
+    digest = hashlib.sha256(prompt.encode()).hexdigest()[:8]
+    assert [variant.output_dir.relative_to(tmp_path).as_posix() for variant in variants] == [
+        "temperature=0.0_system_prompt=none",
+        f"temperature=0.0_system_prompt={digest}",
+        "temperature=0.6_system_prompt=none",
+        f"temperature=0.6_system_prompt={digest}",
+    ]
+    assert [(variant.sampling_params.temperature, variant.system_prompt) for variant in variants[:2]] == [
+        (0.0, ""),
+        (0.0, prompt),
+    ]
+
+
+def test_models_and_sweep_nest_their_directories(make_config, tmp_path):
+    config = make_config(model="hosted_vllm/org/a,hosted_vllm//data/b/", sweep="system_prompt=default")
+    assert [variant.output_dir.relative_to(tmp_path).as_posix() for variant in config.variants()] == [
+        "a/system_prompt=default",
+        "b/system_prompt=default",
+    ]
+    assert sweep_dirname({"top_p": "0.95", "system_prompt": "none"}) == "top_p=0.95_system_prompt=none"
@@ -0,0 +1,76 @@
+from evalhub.inference.streaming import StreamAssembler
+
+
+def assemble(stream: list[dict]) -> StreamAssembler:
+    assembler = StreamAssembler()
+    for chunk in stream:
+        assembler.add(chunk)
+    return assembler
+
+
+def delta(index: int = 0, finish_reason: str | None = None, **fields) -> dict:
+    return {"id": "chatcmpl-fake", "choices": [{"index": index, "delta": fields, "finish_reason": finish_reason}]}
+
+
+def test_chunks_assemble_into_the_completion(completion, chunks):
+    response = completion("The answer is 2.", reasoning_content="1 + 1 = 2")
+    assembler = assemble(chunks(response))
+
+    assert assembler.build() == {"object": "chat.completion", **response}
+    # 3 reasoning and 4 content chunks carried tokens
+    assert assembler.num_chunks == {0: 7}
+    timing = assembler.timing()[0]
+    assert timing["ttft"] <= timing["latency"]
+
+
+def test_interleaved_choices_are_assembled_by_index():
+    assembler = assemble(
+        [
+            delta(1, content="b"),
+            delta(0, content="a"),
+            delta(1, content="b", finish_reason="length"),
+            delta(0, content="a", finish_reason="stop"),
+        ]
+    )
+    response = assembler.build()
+    assert [choice["message"]["content"] for choice in response["choices"]] == ["aa", "bb"]
+    assert [choice["finish_reason"] for choice in response["choices"]] == ["stop", "length"]
+    assert response["usage"] is None
+
+
+def test_tool_call_fragments_are_merged():
+    fragments = [
+        {"index": 0, "id": "call_0", "function": {"name": "python", "arguments": '{"code": '}},
+        {"index": 0, "function": {"arguments": '"1 + 1"}'}},
+        {"index": 1, "id": "call_1", "function": {"name": "python", "arguments": "{}"}},
+    ]
+    message = assemble([delta(tool_calls=[fragment]) for fragment in fragments]).build()["choices"][0]["message"]
+    assert [call["id"] for call in message["tool_calls"]] == ["call_0", "call_1"]
+    assert message["tool_calls"][0]["function"] == {"name": "python", "arguments": '{"code": "1 + 1"}'}
+
+
+def test_check_stop_runs_the_condition_every_interval_characters():
+    seen = []
+    assembler = StreamAssembler()
+
+    def condition(content: str) -> str | None:
+        seen.append(content)
+        return "final" if "2" in content else None
+
+    for piece in ["So the answer ", "is still open, ", "or maybe it is 2", ".\n"]:
+        assembler.add(delta(content=piece))
+        done = assembler.check_stop(condition, interval=16)
+
+    assert done
+    # Checked once 16 more characters arrived, the chunk after the stop is ignored
+    assert seen == ["So the answer is still open, ", "So the answer is still open, or maybe it is 2"]
+    choice = assembler.build()["choices"][0]
+    assert choice["message"]["content"] == "So the answer is still open, or maybe it is 2"
+    assert (choice["finish_reason"], choice["early_stop"]) == ("stop", "final")
+
+
+def test_check_stop_sees_the_end_of_a_parsed_think_block():
+    assembler = assemble([delta(reasoning_content="1 + 1 = 2"), delta(content="\\boxed{2}")])
+    seen = []
+    assert not assembler.check_stop(lambda content: seen.append(content), interval=1)
+    assert seen == ["</think>\\boxed{2}"]
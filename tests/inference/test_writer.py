@@ -0,0 +1,47 @@
+import asyncio
+
+import orjson
+import pytest
+
+from evalhub.inference.raw import iter_raw, zstd_compressor
+from evalhub.inference.writer import BatchWriter, drop_torn_line
+
+
+def test_batched_lines_are_written_in_order(tmp_path):
+    paths = [tmp_path / "raw.jsonl", tmp_path / "raw.index"]
+
+    async def write():
+        writer = BatchWriter(paths, fsync_interval=0)
+        for i in range(1000):
+            await writer.write(paths[0], b"%d\n" % i)
+            await writer.write(paths[1], b"%d\n" % (i * 2))
+        await writer.close()
+
+    asyncio.run(write())
+    assert paths[0].read_bytes().splitlines() == [b"%d" % i for i in range(1000)]
+    assert paths[1].read_bytes().splitlines() == [b"%d" % (i * 2) for i in range(1000)]
+
+
+def test_drop_torn_line(tmp_path):
+    path = tmp_path / "raw.jsonl"
+    path.write_bytes(b'{"task_id": "a"}\n{"task_id": "b"}\n{"task_')
+    drop_torn_line(path)
+    assert path.read_bytes() == b'{"task_id": "a"}\n{"task_id": "b"}\n'
+
+
+def test_zstd_frames_are_indexed(tmp_path):
+    pytest.importorskip("zstandard")
+    raw, index = tmp_path / "raw.jsonl.zst", tmp_path / "raw.zst.index"
+
+    async def write():
+        writer = BatchWriter([raw], indexes={raw: index}, encoders={raw: zstd_compressor()})
+        for i in range(100):
+            await writer.write(raw, b"%d\n" % i, key=f"task/{i % 10}")
+        await writer.close()
+
+    asyncio.run(write())
+    records = list(iter_raw(raw))
+    assert [line for _, _, line in records] == [b"%d\n" % i for i in range(100)]
+    entries = [orjson.loads(line) for line in index.read_bytes().splitlines()]
+    assert [[f"task/{i % 10}", offset, length] for i, (offset, length, _) in enumerate(records)] == entries
+    assert entries[-1][1] + entries[-1][2] == raw.stat().st_size
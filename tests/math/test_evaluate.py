@@ -0,0 +1,35 @@
+import orjson
+import pytest
+
+from evalhub.benchmarks.base import GroundTruth, Task
+from evalhub.benchmarks.math.base import MathDataset
+
+
+class Toy(MathDataset):
+    def load_tasks(self) -> None:
+        for task_id in ("toy/0", "toy/1", "toy/2"):
+            self.add_task(Task(task_id=task_id, prompt="1 + 1"))
+            self.add_groundtruth(GroundTruth(task_id=task_id, answer="2"))
+
+
+def test_pass_at_k_is_not_extrapolated_past_the_drawn_samples(tmp_path, monkeypatch):
+    monkeypatch.setenv("EVALHUB_CACHE_DIR", str(tmp_path / "cache"))
+    # toy/0 was stopped early after 20 correct samples, toy/2 lost samples to failures
+    samples = {"toy/0": ["2"] * 20, "toy/1": ["3"] * 64, "toy/2": ["3"] * 10}
+    with open(tmp_path / "toy.jsonl", "wb") as f:
+        for task_id, solutions in samples.items():
+            f.writelines(orjson.dumps({"task_id": task_id, "solution": solution}) + b"\n" for solution in solutions)
+    counts = {
+        task_id: {"num_samples": len(solutions), "num_correct": 0, "stopped_early": task_id == "toy/0"}
+        for task_id, solutions in samples.items()
+    }
+    (tmp_path / "toy_samples.json").write_bytes(orjson.dumps(counts))
+
+    Toy("toy").evaluate(tmp_path / "toy.jsonl", tmp_path / "eval")
+
+    results = {result["task_id"]: result for result in map(orjson.loads, open(tmp_path / "eval" / "toy_results.jsonl"))}
+    assert results["toy/0"]["pass_at_k"]["64"] == pytest.approx(1.0)
+    assert list(results["toy/2"]["pass_at_k"]) == ["1", "2", "4", "8"]
+    summary = orjson.loads((tmp_path / "eval" / "toy_summary.json").read_bytes())
+    assert summary["pass_at_k"]["1"] == pytest.approx(1 / 3)
+    assert summary["pass_at_k"]["64"] == pytest.approx(0.5)
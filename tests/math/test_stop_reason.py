@@ -0,0 +1,42 @@
+import pytest
+
+from evalhub.benchmarks.general.gpqa import ANSWER_PATTERN_MULTICHOICE
+from evalhub.benchmarks.math.base import MathDataset, answer_line_stop_reason
+
+
+class Boxed(MathDataset):
+    def load_tasks(self) -> None:
+        pass
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch) -> Boxed:
+    monkeypatch.setenv("EVALHUB_CACHE_DIR", str(tmp_path))
+    return Boxed()
+
+
+@pytest.mark.parametrize(
+    "response,reason",
+    [
+        ("<think>maybe \\boxed{3}</think>So the answer is \\boxed{2}.", "boxed_answer"),
+        ("<think>maybe \\boxed{3}", None),  # boxed inside the think block
+        ("<think>2</think>So the answer is \\boxed{\\frac{1}{", None),  # unclosed box
+        ("So the answer is \\boxed{2}.", None),  # no think block
+    ],
+)
+def test_boxed_answer_after_think_block(dataset, response, reason):
+    assert dataset.stop_reason(response) == reason
+
+
+@pytest.mark.parametrize(
+    "response,reason",
+    [
+        ("Answer: B\n", "answer_line"),
+        ("<think>Answer: A\n</think>Answer: C\n", "answer_line"),
+        ("Answer: B", None),  # the line may still go on
+        ("<think>Answer: A\nhmm", None),  # inside an unclosed think block
+        ("<think>Answer: A\n</think>The answer is", None),
+    ],
+)
+def test_answer_line(response, reason):
+    assert answer_line_stop_reason(response, ANSWER_PATTERN_MULTICHOICE) == reason